@@ -0,0 +1,55 @@
+"""
+测量 genie_tts_service 每句话在"写 WAV -> 读回来"这一步上的耗时，对比普通临时文件和内存文件（memfd/tmpfs）。
+
+不需要加载模型：用 wave 模块写入和 genie 一样格式的音频（32kHz、16bit、单声道），
+只测量文件往返本身的开销。在 backend 目录下运行:
+    python -m benchmark.genie_output --seconds 3 --rounds 200
+"""
+import argparse
+import os
+import statistics
+import time
+import wave
+from core.component.tts.genie_tts_service import InMemoryOutput
+
+SAMPLE_RATE = 32000
+
+
+def make_writer(frames: bytes):
+    """模拟 genie.tts(save_path=path) 保存音频的过程"""
+    def writer(path):
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(frames)
+    return writer
+
+
+def run(name: str, output: InMemoryOutput, writer, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        output.write(writer)
+        samples.append((time.perf_counter() - start) * 1000)
+    output.close()
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<8} mean={statistics.mean(samples):.3f}ms  p50={statistics.median(samples):.3f}ms  p95={p95:.3f}ms")
+
+
+def main(seconds: float, rounds: int):
+    frames = os.urandom(int(SAMPLE_RATE * seconds) * 2)
+    writer = make_writer(frames)
+    print(f"每句音频 {seconds}s，约 {len(frames) / 1024:.0f}KB，共 {rounds} 轮")
+    run("file", InMemoryOutput(use_memory=False), writer, rounds)
+    memory = InMemoryOutput(use_memory=True)
+    run("memfd" if memory.fd is not None else "tmpfs", memory, writer, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="genie TTS 输出路径耗时对比")
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.seconds, args.rounds)
@@ -0,0 +1,73 @@
+"""
+对比 Ollama 客户端开启/关闭连接池时的首 token 延迟（TTFT）。
+
+在本机起一个假的 Ollama 服务（只实现 /api/chat 的流式返回），不需要真实模型。
+在 backend 目录下运行:
+    python -m benchmark.ollama_pool --rounds 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from aiohttp import web
+from core.component.llm.ollama_api import Client
+
+
+async def fake_chat(request):
+    """模拟 Ollama 的 /api/chat 流式接口，逐行返回 NDJSON"""
+    await request.json()
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    for token in ["你", "好", "。"]:
+        await response.write(json.dumps({"message": {"content": token}, "done": False}).encode() + b"\n")
+    await response.write(json.dumps({"message": {"content": ""}, "done": True}).encode() + b"\n")
+    await response.write_eof()
+    return response
+
+
+async def measure_ttft(client: Client, messages: list, pooled: bool) -> float:
+    """返回一次请求的首 token 延迟（毫秒）"""
+    start = time.perf_counter()
+    ttft = None
+    async for _ in client.generate(messages):
+        if ttft is None:
+            ttft = (time.perf_counter() - start) * 1000
+    if not pooled:
+        # 关闭会话，下一次请求就会重新建立 TCP 连接，等价于改造前每次 new ClientSession 的行为
+        await client.close()
+    return ttft
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<10} mean={statistics.mean(samples):.3f}ms  p50={statistics.median(samples):.3f}ms  p95={p95:.3f}ms")
+
+
+async def main(rounds: int, port: int):
+    app = web.Application()
+    app.router.add_post("/api/chat", fake_chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    messages = [{"role": "user", "content": "你好"}]
+    try:
+        for pooled in (False, True):
+            client = Client(model="stub", base_url=base_url)
+            await measure_ttft(client, messages, pooled)  # 预热
+            samples = [await measure_ttft(client, messages, pooled) for _ in range(rounds)]
+            await client.close()
+            report("pooled" if pooled else "no-pool", samples)
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ollama 客户端连接池 TTFT 对比")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--port", type=int, default=11499)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.port))
@@ -0,0 +1,233 @@
+"""
+完整聊天流水线的离线压测：LLM / TTS / 翻译 / ASR 全部换成桩组件（各组件目录下的 stub.py，
+通过配置里的 select 加载），不需要 GPU 和任何外部服务。
+
+在进程内启动 uvicorn 跑 main.app，模拟 N 个并发的 WebSocket 会话，每个会话连续对话若干轮，
+统计整轮耗时、首字耗时、首段音频耗时和消息吞吐量，最后附上服务端各阶段的耗时分位数（开启 --cache 时还有缓存命中率）。
+在 backend 目录下运行:
+    python -m benchmark.pipeline --sessions 20 --turns 5
+    python -m benchmark.pipeline --sessions 20 --turns 5 --binary --stream --tts-delay 0.3
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+import uvicorn
+import websockets
+import yaml
+
+
+def build_config(args, work_dir: Path) -> dict:
+    """桩组件的配置，数据库、密钥都放在临时目录里，不影响正式数据"""
+    return {
+        "llm": {
+            "system_prompt": "你是真帆。",
+            "context": {"max_tokens": 3072, "low_watermark": 0.75},
+            "select": "stub",
+            "stub": {
+                "response": args.response,
+                "tokens_per_second": args.token_rate,
+                "first_token_delay": args.first_token_delay,
+            },
+        },
+        "tts": {
+            "select": "stub",
+            "stream": args.stream,
+            "cache": {"enabled": args.cache, "disk_dir": ""},
+            "executor": {"max_workers": args.tts_workers, "queue_depth": args.tts_queue_depth},
+            "batch": {"enabled": args.batch, "max_wait_ms": args.batch_wait_ms, "max_items": args.batch_items},
+            "stub": {
+                "first_chunk_delay": args.tts_delay,
+                "seconds_per_char": args.tts_char_delay,
+                "audio_seconds_per_char": args.audio_seconds_per_char,
+            },
+        },
+        "translator": {
+            "select": "stub",
+            "cache": {"enabled": args.cache, "db_path": ""},
+            "stub": {"delay": args.translate_delay},
+        },
+        "asr": {
+            "select": "stub",
+            "stub": {"finalize_delay": args.asr_delay},
+        },
+        "pipeline": {
+            "lookahead": args.lookahead,
+            "coalesce_max_chars": args.coalesce_max_chars,
+            "shed_after": args.shed_after,
+        },
+        "history": {"enabled": True, "db_path": str(work_dir / "history.db")},
+        "summarizer": {"enabled": False},
+        "session": {"select": args.session_store, "sqlite": {"db_path": str(work_dir / "sessions.db")}},
+        "auth": {
+            "db_name": str(work_dir / "users.db"),
+            "secret_key_file": str(work_dir / "auth_secret.key"),
+        },
+    }
+
+
+class TurnResult:
+    def __init__(self, latency: float, first_text: float, first_audio: float, messages: int, audio_bytes: int):
+        self.latency = latency
+        self.first_text = first_text
+        self.first_audio = first_audio
+        self.messages = messages
+        self.audio_bytes = audio_bytes
+
+
+async def run_session(url: str, token: str, turns: int, binary: bool, voice: bool, results: list):
+    """一个会话：协商帧格式后连续对话 turns 轮"""
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"type": "hello", "binary": binary, "token": token}))
+        while json.loads(await ws.recv()).get("type") != "hello":
+            pass
+
+        for _ in range(turns):
+            start = time.perf_counter()
+            if voice:
+                # 发送 0.1 秒的静音作为一次语音输入，ASR 桩组件会回调固定的识别结果
+                silence = base64.b64encode(bytes(3200)).decode()
+                await ws.send(json.dumps({"type": "audio", "token": token, "data": silence, "is_final": True}))
+            else:
+                await ws.send(json.dumps({"type": "chat", "token": token, "data": "你好，今天过得怎么样？"}))
+
+            first_text = first_audio = None
+            messages = audio_bytes = 0
+            while True:
+                message = await ws.recv()
+                messages += 1
+                now = time.perf_counter()
+                if isinstance(message, bytes):
+                    first_audio = first_audio or now
+                    audio_bytes += len(message)
+                    continue
+                msg = json.loads(message)
+                if msg["type"] == "text":
+                    first_text = first_text or now
+                elif msg["type"] == "audio":
+                    first_audio = first_audio or now
+                    audio_bytes += len(msg["data"])
+                elif msg["type"] == "end":
+                    break
+                elif msg["type"] == "error":
+                    raise RuntimeError(msg.get("msg"))
+
+            end = time.perf_counter()
+            results.append(TurnResult(
+                end - start,
+                (first_text or end) - start,
+                (first_audio or end) - start,
+                messages,
+                audio_bytes,
+            ))
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))]
+
+
+def report(name: str, values: list):
+    print(f"{name:<10} p50 {percentile(values, 0.5) * 1000:8.1f}ms  "
+          f"p95 {percentile(values, 0.95) * 1000:8.1f}ms  "
+          f"p99 {percentile(values, 0.99) * 1000:8.1f}ms  "
+          f"avg {statistics.mean(values) * 1000:8.1f}ms")
+
+
+async def main(args):
+    work_dir = Path(tempfile.mkdtemp(prefix="maho-bench-"))
+    config_path = work_dir / "bench_config.yaml"
+    config_path.write_text(yaml.safe_dump(build_config(args, work_dir), allow_unicode=True), encoding="utf-8")
+    os.environ["MAHO_CONFIG"] = str(config_path)
+
+    import logging
+    import main as app_main  # 必须在设置 MAHO_CONFIG 之后导入
+    from core.util.metrics import metrics
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    app_main.auth_manager.register_user("bench", "bench")
+    token = app_main.auth_manager.pack_token("bench")
+
+    server = uvicorn.Server(uvicorn.Config(app_main.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    url = f"ws://127.0.0.1:{port}/ws"
+
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(url, token, args.turns, args.binary, args.voice, results)
+        for _ in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - start
+
+    server.should_exit = True
+    await server_task
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    messages = sum(r.messages for r in results)
+    audio_bytes = sum(r.audio_bytes for r in results)
+    print(f"会话数 {args.sessions}，每个会话 {args.turns} 轮，共 {len(results)} 轮，耗时 {elapsed:.2f}s")
+    report("整轮耗时", [r.latency for r in results])
+    report("首字耗时", [r.first_text for r in results])
+    report("首段音频", [r.first_audio for r in results])
+    print(f"消息吞吐   {messages / elapsed:8.1f} 条/s，音频 {audio_bytes / elapsed / 1024 / 1024:.2f} MB/s，"
+          f"{len(results) / elapsed:.2f} 轮/s")
+
+    print("\n服务端各阶段耗时:")
+    for stage, stats in metrics.snapshot().items():
+        print(f"  {stage:<32} n={stats['count']:<6} p50 {stats['p50'] * 1000:8.1f}ms  "
+              f"p95 {stats['p95'] * 1000:8.1f}ms  p99 {stats['p99'] * 1000:8.1f}ms")
+
+    counters = metrics.counter_snapshot()
+    if counters:
+        print("\n服务端事件计数:")
+        for name, value in counters.items():
+            print(f"  {name:<32} {value}")
+
+    caches = metrics.cache_snapshot()
+    if caches:
+        print("\n缓存命中:")
+        for cache, stats in caches.items():
+            print(f"  {cache:<32} 命中 {stats['hits']:<6} 未命中 {stats['misses']:<6} "
+                  f"命中率 {stats['hit_rate'] * 100:5.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="聊天流水线离线压测（桩组件）")
+    parser.add_argument("--sessions", type=int, default=10, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=3, help="每个会话的对话轮数")
+    parser.add_argument("--binary", action="store_true", help="使用二进制音频帧")
+    parser.add_argument("--voice", action="store_true", help="用语音输入（经过 ASR 桩组件）代替文本")
+    parser.add_argument("--stream", action="store_true", help="开启流式 TTS")
+    parser.add_argument("--cache", action="store_true", help="开启翻译和 TTS 缓存")
+    parser.add_argument("--lookahead", type=int, default=2, help="流水线提前量")
+    parser.add_argument("--tts-workers", type=int, default=4, help="TTS 执行器的 worker 数")
+    parser.add_argument("--tts-queue-depth", type=int, default=8, help="TTS 执行器最多排队的任务数")
+    parser.add_argument("--batch", action="store_true", help="开启 TTS 微批合成")
+    parser.add_argument("--batch-wait-ms", type=float, default=10, help="微批最长等待时间（毫秒）")
+    parser.add_argument("--batch-items", type=int, default=8, help="微批最多句数")
+    parser.add_argument("--coalesce-max-chars", type=int, default=120, help="TTS 积压时合并句子的字数上限，0 表示不合并")
+    parser.add_argument("--shed-after", type=float, default=0, help="TTS 积压时句子从切出来到拿到名额超过多少秒跳过语音，0 表示不跳过")
+    parser.add_argument("--session-store", default="memory", choices=["memory", "sqlite"], help="会话状态存储")
+    parser.add_argument("--response", default="你好，我是真帆。今天过得怎么样？有什么想聊的都可以告诉我。",
+                        help="LLM 桩组件每轮输出的文本")
+    parser.add_argument("--token-rate", type=float, default=50, help="LLM 每秒输出的 token 数")
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="LLM 首 token 延迟（秒）")
+    parser.add_argument("--translate-delay", type=float, default=0.05, help="每句翻译耗时（秒）")
+    parser.add_argument("--tts-delay", type=float, default=0.15, help="TTS 首段音频延迟（秒）")
+    parser.add_argument("--tts-char-delay", type=float, default=0.02, help="TTS 每个字的合成耗时（秒）")
+    parser.add_argument("--audio-seconds-per-char", type=float, default=0.2, help="每个字生成的音频时长（秒）")
+    parser.add_argument("--asr-delay", type=float, default=0.1, help="ASR 出最终结果的延迟（秒）")
+    parser.add_argument("--port", type=int, default=0, help="监听端口，0 表示随机")
+    parser.add_argument("--verbose", action="store_true", help="输出服务端 INFO 日志")
+    asyncio.run(main(parser.parse_args()))
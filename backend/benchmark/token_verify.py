@@ -0,0 +1,48 @@
+"""
+测量每个 WebSocket 连接每秒能验证多少条消息的 token：
+- uncached: 每条消息都完整验证一次 token（解析 + 验签）
+- ttl-cache: AuthManager 的 token 缓存命中
+- session: 验证结果绑定在会话上（WSHandler.authorize），token 不变时直接通过
+
+使用临时数据库，不影响 data/db/users.db。在 backend 目录下运行:
+    python -m benchmark.token_verify --messages 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+import types
+from core.auth.login import AuthManager
+from core.handler.ws_handler import WSHandler
+
+
+def run(name: str, check, messages: int):
+    start = time.perf_counter()
+    for _ in range(messages):
+        assert check()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {messages / elapsed:12.0f} 条/秒")
+
+
+def main(messages: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_name = os.path.join(tmp_dir, "users.db")
+
+        uncached = AuthManager(db_name, token_cache_ttl=0)
+        uncached.register_user("bench", "bench")
+        token = uncached.pack_token("bench")
+        run("uncached", lambda: uncached.verify_token(token), messages)
+
+        cached = AuthManager(db_name)
+        run("ttl-cache", lambda: cached.verify_token(token), messages)
+
+        handler = WSHandler(cached)
+        session = types.SimpleNamespace(user={})
+        run("session", lambda: handler.authorize(session, token), messages)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="token 验证吞吐量对比")
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.messages)
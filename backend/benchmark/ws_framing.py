@@ -0,0 +1,65 @@
+"""
+对比 WebSocket 音频的两种帧格式：base64 + JSON 和二进制帧（core/handler/binary_frame.py）。
+
+统计一段音频按 30KB 分片后"编码 + 解码"的 CPU 吞吐量和线上传输字节数，
+不需要起服务。在 backend 目录下运行:
+    python -m benchmark.ws_framing --audio-kb 200 --rounds 500
+"""
+import argparse
+import base64
+import json
+import os
+import time
+from core.handler.binary_frame import FRAME_AUDIO, pack_frame, unpack_frame
+
+CHUNK_SIZE = 30 * 1024
+
+
+def json_roundtrip(audio: bytes) -> int:
+    """编码成 JSON 消息再解码回来，返回线上字节数"""
+    wire = 0
+    for i in range(0, len(audio), CHUNK_SIZE):
+        chunk = audio[i:i + CHUNK_SIZE]
+        text = json.dumps({
+            "type": "audio",
+            "data": base64.b64encode(chunk).decode(),
+            "is_final": i + CHUNK_SIZE >= len(audio),
+        })
+        wire += len(text)
+        msg = json.loads(text)
+        base64.b64decode(msg["data"])
+    return wire
+
+
+def binary_roundtrip(audio: bytes) -> int:
+    """打包成二进制帧再解包，返回线上字节数"""
+    wire = 0
+    for seq, i in enumerate(range(0, len(audio), CHUNK_SIZE)):
+        frame = pack_frame(FRAME_AUDIO, seq, audio[i:i + CHUNK_SIZE], i + CHUNK_SIZE >= len(audio))
+        wire += len(frame)
+        unpack_frame(frame)
+    return wire
+
+
+def run(name: str, roundtrip, audio: bytes, rounds: int):
+    start = time.perf_counter()
+    wire = 0
+    for _ in range(rounds):
+        wire = roundtrip(audio)
+    elapsed = time.perf_counter() - start
+    throughput = len(audio) * rounds / elapsed / 1024 / 1024
+    print(f"{name:<8} {throughput:8.1f} MB/s  每段音频线上 {wire / 1024:.1f}KB ({wire / len(audio):.2%})")
+
+
+def main(audio_kb: int, rounds: int):
+    audio = os.urandom(audio_kb * 1024)
+    run("json", json_roundtrip, audio, rounds)
+    run("binary", binary_roundtrip, audio, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WebSocket 音频帧格式吞吐量对比")
+    parser.add_argument("--audio-kb", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+    main(args.audio_kb, args.rounds)
@@ -1,33 +1,61 @@
-from pathlib import Path
 import asyncio
-from core.util.config import load_yaml
-from core.component.llm.LLMService import LLM
-from core.component.tts.TTSService import TTS
-from core.component.translator.TranslatorService import Translator
-from core.component.asr.ASRService import ASR
+from core.component.registry import ComponentRegistry
+from core.context_window import ContextWindow
+from core.segmenter import Segmenter
 
 
 class BaseAmadeus:
     """
-        Amadeus核心类，负责初始化和管理核心功能
+        Amadeus核心类，只保存单个连接的状态，
+        LLM/TTS/翻译组件来自进程级的 ComponentRegistry，所有会话共享。
+        需要跨连接、跨 worker 保留的部分（上下文窗口、用户、进行中的一轮）另外存到会话存储里，
+        见 core/session_store.py。
     """
 
-    def __init__(self):
-        config_path = Path("config.yaml")
-        self.config = load_yaml(config_path)
-        self.llm = LLM(self.config.get("llm", {}))
-        self.tts = TTS(self.config.get("tts", {}))
-        self.translator = Translator(self.config.get("translator", {}))
-        self.asr = ASR(self.config.get("asr", {}))
+    def __init__(self, components: ComponentRegistry):
+        self.config = components.config
+        self.llm = components.llm
+        self.tts = components.tts
+        self.translator = components.translator
+        self.asr = components.create_asr()  # ASR 与会话的音频流绑定，每个会话单独创建
+        self.history = components.history  # 对话记录，未启用时为 None
+        self.summarizer = components.summarizer  # 对话摘要器，未启用时为 None
+        self.summary_task = None  # 空闲时运行的摘要任务
+        self.sessions = components.sessions  # 会话存储
+        self.session_id = None  # 会话 id，前端重连时在 hello 里带上就能接上原来的会话
+        self.chat_task = None  # 当前连接正在运行的聊天任务
+        self.turn_id = None  # 进行中的这一轮的 id，正常结束后清空
+        self.last_turn = None  # 上一轮：{"id": ..., "completed": 是否正常结束}
 
         self.message_queue = asyncio.Queue()  # 字符队列
+        self.segmenter = Segmenter(**self.config.get("segmenter", {}))  # 把字符流切成送给 TTS 的文本段
         self.sentence_queue = asyncio.Queue()  # 句子队列
+        # 音频队列：按句子顺序存放 (合成任务, 音频分段队列, 句子时间线)
+        self.audio_queue = asyncio.Queue()
+        # 流水线提前量：开始合成前先占一个名额，发送完（或被取消）时归还。
+        # 正在发送的一句加上提前合成的 lookahead 句，同时最多 lookahead + 1 句在合成
+        pipeline_config = self.config.get("pipeline", {})
+        self.lookahead_slots = asyncio.Semaphore(max(1, pipeline_config.get("lookahead", 2)) + 1)
+        # TTS 执行器积压时的处理：合并排队中的句子 / 丢弃排队太久的句子的语音，见 core/chat.py
+        self.coalesce_max_chars = pipeline_config.get("coalesce_max_chars", 120)
+        self.shed_after = pipeline_config.get("shed_after", 0)
+        self.sending = None  # 正在发送音频的那一句：(合成任务, 音频分段队列)
+        self.pipeline_generation = 0  # 每次打断加一，用来丢弃打断前已经出队的句子
+        self.turn_trace = None  # 当前这一轮对话的时间线，见 core/util/trace.py
+        self.asr_finished_at = None  # 最近一次语音输入结束（收到最后一帧）的时间
         self.user = {}  # 用户信息
-        self.context_window = []  # 上下文窗口
+        self.binary_frames = False  # 是否已和前端协商使用二进制音频帧，见 core/handler/binary_frame.py
+        self.audio_seq = 0  # 发送给前端的二进制音频帧序号
+        # 上下文窗口：系统提示词 + 摘要 + 按 token 预算裁剪的对话
+        llm_config = self.config.get("llm", {})
+        context_config = llm_config.get("context", {})
+        self.context_window = ContextWindow(
+            system_prompt=llm_config.get("system_prompt", ""),
+            max_tokens=context_config.get("max_tokens", 0),
+            low_watermark=context_config.get("low_watermark", 0.75),
+            keep_dropped=self.summarizer is not None,  # 有摘要器时裁掉的消息留给摘要
+            max_pending=context_config.get("max_pending", 64),
+        )
 
-        # 如果配置中有系统提示词，则添加到上下文窗口第一条
-        system_prompt = self.config.get("llm", {}).get("system_prompt", "")
-        if system_prompt:
-            self.context_window.append({"role": "system", "content": system_prompt})
-            
-        self.context_window_index = 0  # 上下文窗口索引，每次前端获取上下文窗口就更新这个索引
+        self.context_window_index = 0  # 前端已经拿到的最后一条对话记录 id，增量同步时从这里往后取
+        self.history_user = None  # 上下文窗口已经从哪个用户的对话记录恢复过
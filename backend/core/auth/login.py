@@ -1,43 +1,113 @@
+import asyncio
 import hashlib
+import hmac
+import os
 import secrets
 import json
 import base64
 import logging
+import threading
+import time
 from pathlib import Path
 import sys
 
 # 添加项目根路径
 sys.path.append(str(Path(__file__).parent.parent.parent))
-from core.util.storage import get_database_connection
+from core.util.storage import get_database, get_async_database
+from core.util.cache import LRUCache
 
 
 class AuthManager:
     """
     用户认证管理器，负责用户注册、登录、token生成和验证
+
+    token 是 HMAC 签名的无状态令牌：base64(载荷).base64(签名)，载荷里带签发时间和过期时间，
+    验证只需要算一次签名，不查数据库，多个 uvicorn worker 只要密钥相同就能互相认可对方签发的 token。
+    让 token 提前失效有两种方式：revoke_token 注销单个 token（登出），
+    invalidate_user 让某个用户在此之前签发的所有 token 失效（删除用户、修改密码后）。
     """
     
-    def __init__(self, db_name: str = "data/db/users.db"):
+    def __init__(self,
+                 db_name: str = "data/db/users.db",
+                 token_cache_ttl: float = 300,
+                 token_cache_size: int = 10000,
+                 token_ttl: float = 7 * 24 * 3600,
+                 secret_keys: list | None = None,
+                 secret_key_file: str = "data/auth_secret.key",
+                 revocation_store=None,
+                 revocation_refresh_interval: float = 5):
+        """
+        参数:
+            db_name: 用户数据库路径
+            token_cache_ttl: 验证通过的 token 缓存多久（秒），0 表示不缓存
+            token_cache_size: 最多缓存多少个 token，超出时淘汰最久没用过的
+            token_ttl: token 有效期（秒）
+            secret_keys: 签名密钥列表，第一个用于签发，其余的只用于验证（轮换密钥时把旧密钥放到后面）
+            secret_key_file: 没有配置密钥时使用的密钥文件，不存在会自动生成，多个 worker 共用
+            revocation_store: 保存注销记录的共享存储（提供 async 的 revoke / revoked_tokens / revoke_user / revoked_users，
+                见 core/session_store.py），
+                多个 worker 时用它让登出对所有 worker 生效；不传则只记录在当前进程的内存里
+            revocation_refresh_interval: 多久从 revocation_store 同步一次其他 worker 的注销记录（秒）
+        """
         self.db_name = db_name
+        self.token_cache_ttl = token_cache_ttl
+        self.token_ttl = token_ttl
+        self.secret_keys = [key.encode() for key in (secret_keys or [])] or [self._load_secret_key(secret_key_file)]
+        if not all(self.secret_keys):
+            # 空密钥签出来的 token 谁都能伪造，宁可启动失败
+            raise ValueError("token 签名密钥不能为空")
+        self._token_cache = LRUCache(max_items=max(1, token_cache_size))  # token -> (用户信息, 缓存到期时间)
+        self._revoked_lock = threading.Lock()
+        # 已注销 token 的 jti -> token 过期时间，过期后自动清理。
+        # 有 revocation_store 时这是它的本地副本，定期同步，验证 token 时不访问数据库
+        self._revoked = {}
+        self._not_before = {}  # 用户名 -> 时间戳，这个用户在此之前签发的 token 都无效（见 invalidate_user）
+        self.revocation_store = revocation_store
+        self.revocation_refresh_interval = revocation_refresh_interval
+        self._revocation_task = None
+        self.db = get_database(db_name)
+        self.async_db = get_async_database(db_name)
         self._init_database()
+
+    @staticmethod
+    def _load_secret_key(key_file: str) -> bytes:
+        """
+        读取密钥文件，不存在时生成一个。
+        密钥先完整写进临时文件，再硬链接到正式路径：链接是原子的，而且目标已存在时失败，
+        所以多个 worker 同时启动也只会生成一份，其他 worker 不会读到写了一半（甚至为空）的文件
+        """
+        path = Path(key_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            try:
+                os.link(tmp_path, path)
+                logging.info(f"已生成 token 签名密钥: {key_file}")
+            except FileExistsError:
+                pass
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        key = path.read_text().strip().encode()
+        if not key:
+            raise ValueError(f"token 签名密钥文件为空: {key_file}")
+        return key
     
     def _init_database(self):
         """初始化用户数据库表"""
-        conn = get_database_connection(self.db_name)
-        cursor = conn.cursor()
-        # 检查表是否已存在
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
-        if cursor.fetchone() is None:
-            cursor.execute("""
-                CREATE TABLE users (
+        # 检查表是否已存在。多个 worker 同时启动时可能都认为不存在，所以建表仍然用 IF NOT EXISTS
+        if self.db.fetchone("SELECT name FROM sqlite_master WHERE type='table' AND name='users'") is None:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     username TEXT UNIQUE NOT NULL,
                     password_hash TEXT NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
-            conn.commit()
             logging.info(f"用户数据库已初始化: {self.db_name}")
-        conn.close()
     
     def hash_password(self, password: str) -> str:
         """对密码进行哈希"""
@@ -55,15 +125,11 @@ class AuthManager:
             bool: 注册成功返回True，用户名已存在返回False
         """
         try:
-            conn = get_database_connection(self.db_name)
-            cursor = conn.cursor()
             password_hash = self.hash_password(password)
-            cursor.execute(
+            self.db.execute(
                 "INSERT INTO users (username, password_hash) VALUES (?, ?)",
                 (username, password_hash)
             )
-            conn.commit()
-            conn.close()
             logging.info(f"用户 {username} 注册成功")
             return True
         except Exception as e:
@@ -82,15 +148,22 @@ class AuthManager:
             bool: 验证成功返回True，否则返回False
         """
         try:
-            conn = get_database_connection(self.db_name)
-            cursor = conn.cursor()
-            password_hash = self.hash_password(password)
-            cursor.execute(
-                "SELECT * FROM users WHERE username = ? AND password_hash = ?",
-                (username, password_hash)
+            result = self.db.fetchone(
+                "SELECT 1 FROM users WHERE username = ? AND password_hash = ?",
+                (username, self.hash_password(password))
+            )
+            return result is not None
+        except Exception as e:
+            logging.error(f"验证用户失败: {e}")
+            return False
+
+    async def verify_user_async(self, username: str, password: str) -> bool:
+        """verify_user 的异步版本，查询在数据库线程池里执行，不阻塞事件循环"""
+        try:
+            result = await self.async_db.fetchone(
+                "SELECT 1 FROM users WHERE username = ? AND password_hash = ?",
+                (username, self.hash_password(password))
             )
-            result = cursor.fetchone()
-            conn.close()
             return result is not None
         except Exception as e:
             logging.error(f"验证用户失败: {e}")
@@ -98,69 +171,181 @@ class AuthManager:
     
     def pack_token(self, username: str) -> str:
         """
-        将用户信息打包成token
+        将用户信息打包成签名的token
         
         参数:
             username: 用户名
         
         返回:
-            str: Base64编码的token字符串
+            str: base64(载荷).base64(签名) 形式的token字符串
         """
-        # 生成随机salt增强安全性
-        salt = secrets.token_hex(16)
+        now = time.time()
         user_info = {
             "username": username,
-            "salt": salt
+            "iat": round(now, 3),                     # 签发时间，精确到毫秒，和 invalidate_user 的时间比较
+            "exp": int(now) + int(self.token_ttl),    # 过期时间
+            "jti": secrets.token_hex(16),        # token 唯一标识，注销时用
         }
-        json_str = json.dumps(user_info)
-        token = base64.urlsafe_b64encode(json_str.encode()).decode()
-        return token
+        payload = self._b64encode(json.dumps(user_info, separators=(",", ":")).encode())
+        signature = self._b64encode(self._sign(payload.encode(), self.secret_keys[0]))
+        return f"{payload}.{signature}"
     
     def verify_token(self, token: str) -> dict:
         """
-        验证token并返回用户信息
+        验证token并返回用户信息：检查签名、过期时间和注销列表，不访问数据库。
+        验证通过的结果会缓存 token_cache_ttl 秒
         
         参数:
-            token: Base64编码的token字符串
+            token: pack_token 生成的token字符串
         
         返回:
             dict: 验证成功返回用户信息字典，失败返回None
         """
+        now = time.monotonic()
+        cached = self._token_cache.get(token)
+        if cached and cached[1] > now and not self.is_revoked(cached[0]):
+            return cached[0]
+
         try:
-            json_str = base64.urlsafe_b64decode(token.encode()).decode()
-            user_info = json.loads(json_str)
-            
-            # 验证用户是否存在
-            username = user_info.get("username")
-            if username and self._user_exists(username):
-                return user_info
-            return None # pyright: ignore[reportReturnType]
+            payload, signature = token.split(".")
+            expected = self._b64decode(signature)
+            # 依次尝试所有密钥，兼容密钥轮换前签发的 token
+            if not any(hmac.compare_digest(self._sign(payload.encode(), key), expected)
+                       for key in self.secret_keys):
+                return None # pyright: ignore[reportReturnType]
+
+            user_info = json.loads(self._b64decode(payload))
+            if not user_info.get("username") or user_info.get("exp", 0) <= time.time():
+                return None # pyright: ignore[reportReturnType]
+            if self.is_revoked(user_info):
+                return None # pyright: ignore[reportReturnType]
+
+            if self.token_cache_ttl > 0:
+                # 缓存时间不超过 token 本身的剩余有效期
+                ttl = min(self.token_cache_ttl, user_info["exp"] - time.time())
+                self._token_cache.put(token, (user_info, now + ttl))
+            return user_info
         except Exception as e:
             logging.error(f"验证token失败: {e}")
             return None # pyright: ignore[reportReturnType]
-    
-    def _user_exists(self, username: str) -> bool:
-        """检查用户是否存在"""
-        try:
-            conn = get_database_connection(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-            result = cursor.fetchone()
-            conn.close()
-            return result is not None
-        except Exception as e:
-            logging.error(f"检查用户是否存在失败: {e}")
+
+    def revoke_token(self, token: str) -> bool:
+        """
+        注销 token（登出），只在当前进程内生效。配置了 revocation_store 时用 revoke_token_async
+
+        返回:
+            bool: token 有效并已注销返回True
+        """
+        user_info = self.verify_token(token)
+        if not user_info:
+            return False
+        with self._revoked_lock:
+            self._revoked[user_info["jti"]] = user_info["exp"]
+        return True
+
+    async def revoke_token_async(self, token: str) -> bool:
+        """
+        revoke_token 的异步版本：当前进程立即生效，同时写进 revocation_store，
+        其他 worker 最迟 revocation_refresh_interval 秒后同步到（见 sync_revocations）
+        """
+        user_info = self.verify_token(token)
+        if not user_info or not self.revoke_token(token):
+            return False
+        if self.revocation_store is not None:
+            try:
+                await self.revocation_store.revoke(user_info["jti"], user_info["exp"])
+            except Exception as e:
+                logging.error(f"保存 token 注销记录失败: {e}")
+        return True
+
+    def invalidate_user(self, username: str, not_before: float | None = None):
+        """
+        让某个用户在此之前签发的所有 token 立即失效（比如删除用户、修改密码后），之后登录拿到的新 token 不受影响。
+        只在当前进程内生效，配置了 revocation_store 时用 invalidate_user_async
+        """
+        not_before = time.time() if not_before is None else not_before
+        with self._revoked_lock:
+            self._not_before[username] = max(not_before, self._not_before.get(username, 0))
+
+    async def invalidate_user_async(self, username: str):
+        """invalidate_user 的异步版本：同时写进 revocation_store，其他 worker 同步后也生效"""
+        not_before = time.time()
+        self.invalidate_user(username, not_before)
+        if self.revocation_store is not None:
+            try:
+                # 失效记录保留 token_ttl，之后在它之前签发的 token 都已经自然过期
+                await self.revocation_store.revoke_user(username, not_before, not_before + self.token_ttl)
+            except Exception as e:
+                logging.error(f"保存用户 token 失效记录失败: {e}")
+
+    async def refresh_revoked(self):
+        """从 revocation_store 拉取所有还没过期的注销记录和用户失效记录，合并到本地副本"""
+        if self.revocation_store is None:
+            return
+        revoked = await self.revocation_store.revoked_tokens()
+        not_before = await self.revocation_store.revoked_users()
+        with self._revoked_lock:
+            self._revoked.update(revoked)
+            for username, timestamp in not_before.items():
+                self._not_before[username] = max(timestamp, self._not_before.get(username, 0))
+
+    async def sync_revocations(self):
+        """后台任务：定期同步其他 worker 的注销记录，失败只记录日志，下一次再试"""
+        while True:
+            try:
+                await self.refresh_revoked()
+            except Exception as e:
+                logging.error(f"同步 token 注销记录失败: {e}")
+            await asyncio.sleep(self.revocation_refresh_interval)
+
+    def start_revocation_sync(self):
+        """应用启动时调用，没有 revocation_store 时什么也不做"""
+        if self.revocation_store is not None and self._revocation_task is None:
+            self._revocation_task = asyncio.create_task(self.sync_revocations())
+
+    async def close(self):
+        """应用退出时停止同步任务"""
+        if self._revocation_task is not None:
+            self._revocation_task.cancel()
+            try:
+                await self._revocation_task
+            except asyncio.CancelledError:
+                pass
+            self._revocation_task = None
+
+    def is_revoked(self, user_info: dict) -> bool:
+        """
+        检查 token（verify_token 返回的用户信息）是否已失效：单独注销过，或者签发时间早于这个用户的失效时间。
+        只查本地副本，不访问数据库，顺便清理已经过期的记录
+        """
+        if not self._revoked and not self._not_before:
             return False
+        with self._revoked_lock:
+            now = time.time()
+            for expired in [k for k, exp in self._revoked.items() if exp <= now]:
+                del self._revoked[expired]
+            for expired in [k for k, ts in self._not_before.items() if ts + self.token_ttl <= now]:
+                del self._not_before[expired]
+            if user_info.get("jti") in self._revoked:
+                return True
+            not_before = self._not_before.get(user_info.get("username"))
+            return not_before is not None and user_info.get("iat", 0) < not_before
+
+    def _sign(self, payload: bytes, key: bytes) -> bytes:
+        return hmac.new(key, payload, hashlib.sha256).digest()
+
+    @staticmethod
+    def _b64encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    @staticmethod
+    def _b64decode(data: str) -> bytes:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
     
     def list_users(self) -> list:
         """列出所有用户"""
         try:
-            conn = get_database_connection(self.db_name)
-            cursor = conn.cursor()
-            cursor.execute("SELECT username, created_at FROM users")
-            users = cursor.fetchall()
-            conn.close()
-            return users
+            return self.db.fetchall("SELECT username, created_at FROM users")
         except Exception as e:
             logging.error(f"列出用户失败: {e}")
             return []
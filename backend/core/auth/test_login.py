@@ -0,0 +1,119 @@
+import time
+import pytest
+from core.auth.login import AuthManager
+
+
+def make_auth(tmp_path, **kwargs) -> AuthManager:
+    kwargs.setdefault("secret_key_file", str(tmp_path / "auth_secret.key"))
+    return AuthManager(db_name=str(tmp_path / "users.db"), **kwargs)
+
+
+def test_token_round_trip(tmp_path):
+    auth = make_auth(tmp_path)
+    token = auth.pack_token("maho")
+    assert auth.verify_token(token)["username"] == "maho"
+
+
+def test_tampered_token_rejected(tmp_path):
+    auth = make_auth(tmp_path)
+    payload, signature = auth.pack_token("maho").split(".")
+    forged = auth._b64encode(auth._b64decode(payload).replace(b"maho", b"okabe"))
+    assert auth.verify_token(f"{forged}.{signature}") is None
+    assert auth.verify_token("not-a-token") is None
+
+
+def test_expired_token_rejected(tmp_path):
+    auth = make_auth(tmp_path, token_ttl=-1)
+    assert auth.verify_token(auth.pack_token("maho")) is None
+
+
+def test_key_rotation(tmp_path):
+    old = make_auth(tmp_path, secret_keys=["old-key"])
+    token = old.pack_token("maho")
+    rotated = make_auth(tmp_path, secret_keys=["new-key", "old-key"])
+    assert rotated.verify_token(token)["username"] == "maho"
+    assert make_auth(tmp_path, secret_keys=["new-key"]).verify_token(token) is None
+
+
+def test_revoke_token(tmp_path):
+    auth = make_auth(tmp_path)
+    token = auth.pack_token("maho")
+    assert auth.verify_token(token)
+    assert auth.revoke_token(token)
+    assert auth.verify_token(token) is None
+    assert not auth.revoke_token(token)
+
+
+def test_key_file_shared_between_instances(tmp_path):
+    first = make_auth(tmp_path)
+    second = make_auth(tmp_path)
+    assert first.secret_keys == second.secret_keys
+    assert len(first.secret_keys[0]) == 64
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_empty_key_refused(tmp_path):
+    (tmp_path / "auth_secret.key").write_text("")
+    with pytest.raises(ValueError):
+        make_auth(tmp_path)
+    with pytest.raises(ValueError):
+        make_auth(tmp_path, secret_keys=[""])
+
+
+def test_cached_token_still_checks_revocation(tmp_path):
+    auth = make_auth(tmp_path, token_cache_ttl=300)
+    token = auth.pack_token("maho")
+    assert auth.verify_token(token)
+    auth._revoked[auth.verify_token(token)["jti"]] = time.time() + 60
+    assert auth.verify_token(token) is None
+
+
+def test_concurrent_key_generation(tmp_path):
+    """多个 worker 同时启动：都拿到同一份非空密钥"""
+    from concurrent.futures import ProcessPoolExecutor
+    key_file = str(tmp_path / "race" / "auth_secret.key")
+    with ProcessPoolExecutor(max_workers=8) as pool:
+        keys = list(pool.map(AuthManager._load_secret_key, [key_file] * 32))
+    assert keys[0] and set(keys) == {keys[0]}
+
+
+def test_token_cache_bounded(tmp_path):
+    auth = make_auth(tmp_path, token_cache_size=3)
+    tokens = [auth.pack_token(f"user{i}") for i in range(10)]
+    for token in tokens:
+        assert auth.verify_token(token)
+    assert len(auth._token_cache) == 3
+    # 被淘汰的 token 重新走签名验证，照样有效
+    assert auth.verify_token(tokens[0])["username"] == "user0"
+
+
+def test_invalidate_user(tmp_path):
+    auth = make_auth(tmp_path, token_cache_ttl=300)
+    old = auth.pack_token("maho")
+    other = auth.pack_token("okabe")
+    assert auth.verify_token(old)
+    time.sleep(0.01)
+    auth.invalidate_user("maho")
+    # 缓存里的和没缓存的旧 token 都失效，别的用户和之后签发的 token 不受影响
+    assert auth.verify_token(old) is None
+    assert auth.verify_token(other)
+    time.sleep(0.01)
+    assert auth.verify_token(auth.pack_token("maho"))["username"] == "maho"
+
+
+def test_invalidate_user_shared_through_store(tmp_path):
+    import asyncio
+    from core.session_store import SQLiteSessionStore
+
+    async def run():
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        first = make_auth(tmp_path, revocation_store=store)
+        second = make_auth(tmp_path, revocation_store=store)
+        token = first.pack_token("maho")
+        assert second.verify_token(token)
+        time.sleep(0.01)
+        await first.invalidate_user_async("maho")
+        await second.refresh_revoked()
+        return second.verify_token(token)
+
+    assert asyncio.run(run()) is None
@@ -1,49 +1,143 @@
 import logging
 import asyncio
-import re
 import json
+import time
 import base64
+import uuid
+from core.util.metrics import metrics
+from core.util.trace import TurnTrace, SentenceTrace
+from core.handler.binary_frame import FRAME_AUDIO, pack_frame
+from core.summarizer import summarize_when_idle
+from core.session_store import save_session
 
-async def handle_chat(websocket, Amadeus, user_text):
+async def handle_chat(websocket, Amadeus, user_text, started_at=None):
     """
     聊天处理逻辑
+
+    started_at: 本轮开始时间（perf_counter），语音输入时传入 ASR 收到最后一帧的时间，
+        这样整轮耗时包含 ASR 出结果的时间
     """
-    # 发送开始标签
-    await websocket.send_text(json.dumps({"type": "start"}))
-    logging.info(f"成功收到: {user_text}")
+    # 对话开始前停掉空闲摘要，摘要期间上下文窗口不能被改动
+    cancel_summary(Amadeus)
+    trace = Amadeus.turn_trace = TurnTrace(started_at)
+    llm_provider = Amadeus.llm.select
+    Amadeus.turn_id = uuid.uuid4().hex
+    completed = False
+    try:
+        # 发送开始标签
+        await websocket.send_text(json.dumps({"type": "start", "turn_id": Amadeus.turn_id}))
+        logging.info(f"成功收到: {user_text}")
+
+        # 更新用户上下文，并记下进行中的这一轮：这个 worker 中途退出时，重连上来的连接能知道这一轮没有完成
+        Amadeus.context_window.append("user", user_text)
+        await save_history(Amadeus, "user", user_text)
+        await save_session(Amadeus)
+
+        full_response = ""
+        llm_stats = {}
+        llm_start = trace.mark("llm_start")
+        try:
+            async for response in Amadeus.llm.generate(Amadeus.context_window.messages(), stats=llm_stats):
+                if not full_response and response:
+                    metrics.observe("llm_first_token", trace.mark("llm_first_token") - llm_start, provider=llm_provider)
+                full_response += response
+                await Amadeus.message_queue.put(response)
+        finally:
+            # 本轮输出结束，让断句把最后剩下的内容送出。LLM 出错或被取消时也要放，
+            # 否则断句缓冲区里的半句和“已经不是第一段”的状态会带到下一轮（字符队列不限长度，不会阻塞）
+            Amadeus.message_queue.put_nowait(None)
+        metrics.observe("llm_total", trace.mark("llm_done") - llm_start, provider=llm_provider)
+        record_llm_stats(llm_stats, llm_provider)
 
-    # 更新用户上下文
-    Amadeus.context_window.append({"role": "user", "content": user_text})
+        # 更新助手上下文
+        Amadeus.context_window.append("assistant", full_response)
+        await save_history(Amadeus, "assistant", full_response)
 
-    full_response = ""
-    async for response in Amadeus.llm.generate(Amadeus.context_window):
-        full_response += response
-        await Amadeus.message_queue.put(response)
+        # 等待两个队列都处理完毕
+        await Amadeus.message_queue.join()
+        await Amadeus.sentence_queue.join()
 
-    # 更新助手上下文
-    Amadeus.context_window.append(
-        {"role": "assistant", "content": full_response})
+        # 发送结束标签
+        await websocket.send_text(json.dumps({"type": "end"}))
+        record_turn(trace)
+        completed = True
+    finally:
+        Amadeus.last_turn = {"id": Amadeus.turn_id, "completed": completed}
+        Amadeus.turn_id = None
+        await save_session(Amadeus)
+        schedule_summary(Amadeus)
+
+def record_turn(trace):
+    """一轮对话结束：统计整轮的关键耗时，并把时间线写进日志"""
+    trace.mark("end")
+    for name in ("first_sentence", "first_audio", "end"):
+        if name in trace.marks:
+            metrics.observe(f"turn_{name}", trace.marks[name] - trace.start)
+    logging.info(f"本轮时间线: {trace.timeline()}")
+
+def record_llm_stats(stats, provider=""):
+    """
+    记录本轮 LLM 的统计：prompt 计算耗时（prefill）和生成耗时分开统计。
+    prompt_eval_count 远小于上下文长度说明服务端的前缀缓存命中了；load_duration 明显大于 0 说明模型被重新加载过
+    """
+    if not stats:
+        return
+    for key, stage in (("prompt_eval_duration", "llm_prompt_eval"),
+                       ("eval_duration", "llm_eval"),
+                       ("load_duration", "llm_load")):
+        if key in stats:
+            metrics.observe(stage, stats[key], provider=provider)
+    eval_duration = stats.get("eval_duration", 0)
+    speed = stats.get("eval_count", 0) / eval_duration if eval_duration else 0
+    logging.info(
+        f"LLM 统计: prompt {stats.get('prompt_eval_count', '?')} tokens / {stats.get('prompt_eval_duration', 0):.3f}s，"
+        f"生成 {stats.get('eval_count', '?')} tokens / {eval_duration:.3f}s（{speed:.1f} tokens/s），"
+        f"加载 {stats.get('load_duration', 0):.3f}s")
 
-    # 等待两个队列都处理完毕
-    await Amadeus.message_queue.join()
-    await Amadeus.sentence_queue.join()
+def schedule_summary(Amadeus):
+    """对话结束后开始计时，会话空闲一段时间后把旧消息折叠进摘要"""
+    if Amadeus.summarizer is None:
+        return
+    cancel_summary(Amadeus)
+    Amadeus.summary_task = asyncio.create_task(summarize_when_idle(Amadeus))
 
-    # 发送结束标签
-    await websocket.send_text(json.dumps({"type": "end"}))
+def cancel_summary(Amadeus):
+    if Amadeus.summary_task and not Amadeus.summary_task.done():
+        Amadeus.summary_task.cancel()
+    Amadeus.summary_task = None
+
+async def save_history(Amadeus, role, content):
+    """
+    把一条消息追加到当前用户的对话记录里。这条消息前端已经实时收到了，
+    所以同时推进 context_window_index，增量同步时不会再发一遍
+    """
+    username = Amadeus.user.get("username")
+    if Amadeus.history is None or not username or not content:
+        return
+    try:
+        Amadeus.context_window_index = await Amadeus.history.append(username, role, content)
+    except Exception as e:
+        logging.error(f"保存对话记录失败: {e}")
 
 async def process_char_queue(Amadeus, websocket):
     """
-    处理字符队列：发送字符流 -> 组合成句子 -> 放入句子队列
+    处理字符队列：发送字符流 -> 由 Amadeus.segmenter 切分成段 -> 放入句子队列
+    handle_chat 在一轮结束时放入 None，把剩下的内容作为最后一段送出
     """
-    buffer = ""
     is_thinking = False
-    # 定义结束标点符号，用于断句
-    sentence_endings = re.compile(r'[。！？.!?\n]+')
 
     while True:
         try:
             char = await Amadeus.message_queue.get()
 
+            if char is None:
+                # 一轮结束
+                is_thinking = False
+                for segment, started_at in Amadeus.segmenter.flush():
+                    await queue_sentence(Amadeus, segment, started_at)
+                Amadeus.message_queue.task_done()
+                continue
+
             if "<think>" in char:
                 is_thinking = True
                 char = char.replace("<think>", "")
@@ -62,15 +156,8 @@ async def process_char_queue(Amadeus, websocket):
             await websocket.send_text(json.dumps({"type": msg_type, "data": char}))
 
             if not is_thinking:
-                buffer += char
-
-                # 检查是否形成完整句子
-                if sentence_endings.search(char):
-                    sentence = buffer.strip()
-                    if sentence:
-                        # 将完整句子放入句子队列，供 TTS 处理
-                        await Amadeus.sentence_queue.put(sentence)
-                    buffer = ""  # 清空缓冲区
+                for segment, started_at in Amadeus.segmenter.feed(char):
+                    await queue_sentence(Amadeus, segment, started_at)
 
             Amadeus.message_queue.task_done()
 
@@ -79,42 +166,229 @@ async def process_char_queue(Amadeus, websocket):
         except Exception as e:
             logging.error(f"字符队列处理出错: {e!r}")
 
+async def queue_sentence(Amadeus, sentence, started_at):
+    """
+    将切好的一段放入句子队列，供翻译和 TTS 处理，附带这一段的时间线用于统计各阶段耗时
+    """
+    sentence_trace = SentenceTrace(Amadeus.turn_trace)
+    segmented_at = sentence_trace.mark("segmented")
+    metrics.observe("segment", segmented_at - started_at)
+    if Amadeus.turn_trace:
+        Amadeus.turn_trace.mark("first_sentence", segmented_at)
+    await Amadeus.sentence_queue.put((sentence, sentence_trace))
+
 async def process_sentence_queue(Amadeus, websocket):
     """
     处理句子队列：翻译 -> TTS -> 发送音频流
+    翻译和 TTS 以流水线方式提前处理后面的句子（最多 pipeline.lookahead 句），
+    音频则由 send_audio_in_order 严格按句子顺序发送，这样上一句还在发送时下一句已经在合成了。
+    每句的音频分段放在该句自己的 chunks 队列里，合成出一段就可以发一段。
+
+    TTS 执行器积压（所有会话共享的名额用完）时做背压处理，而不是让队列无限增长：
+    拿到提前量名额时执行器仍然积压，就把后面已经在排队的句子合并成一段再合成；
+    配置了 shed_after 时，句子从切出来到拿到执行器名额超过这个时间就跳过语音（见 shed_sentence），
+    不论它是等在句子队列里还是等在执行器前（见 synthesize_sentence）。
     """
-    while True:
+    sender_task = asyncio.create_task(send_audio_in_order(Amadeus, websocket))
+    try:
+        while True:
+            sentence, sentence_trace = await Amadeus.sentence_queue.get()
+            waited = time.perf_counter() - sentence_trace.marks["segmented"]
+            metrics.observe("sentence_queue_wait", waited)
+            try:
+                generation = Amadeus.pipeline_generation
+                # 先占提前量名额再开始合成，名额用完时在这里等待，避免无限制地往前合成
+                await Amadeus.lookahead_slots.acquire()
+                if Amadeus.tts.executor.full:
+                    waited = time.perf_counter() - sentence_trace.marks["segmented"]
+                    if Amadeus.shed_after and waited > Amadeus.shed_after:
+                        shed_sentence(Amadeus, sentence)
+                        Amadeus.lookahead_slots.release()
+                        Amadeus.sentence_queue.task_done()
+                        continue
+                    sentence = coalesce_sentences(Amadeus, sentence)
+                chunks = asyncio.Queue()
+                task = asyncio.create_task(synthesize_sentence(Amadeus, sentence, chunks, sentence_trace))
+                Amadeus.audio_queue.put_nowait((task, chunks, sentence_trace))
+                if generation != Amadeus.pipeline_generation:
+                    # 等待名额期间被打断了，这一句也不应该再发送
+                    cancel_sentence(task, chunks)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"句子队列处理出错: {e!r}")
+                Amadeus.sentence_queue.task_done()
+    finally:
+        sender_task.cancel()
+        cancel_pending_audio(Amadeus)
+
+
+def coalesce_sentences(Amadeus, sentence):
+    """
+    把句子队列里已经在排队的句子并入当前这一句，合并到超过 coalesce_max_chars 为止，
+    一次合成代替多次排队，减少占用的执行器名额。合并进来的句子不再单独发送音频
+    """
+    merged = 0
+    while (len(sentence) < Amadeus.coalesce_max_chars
+           and not Amadeus.sentence_queue.empty()):
         try:
-            sentence = await Amadeus.sentence_queue.get()
-
-            loop = asyncio.get_event_loop()
-            # 翻译成日语
-            ja_sentence = await loop.run_in_executor(None, Amadeus.translator.translate, sentence)
-            logging.info(f"翻译结果: {ja_sentence}")
-
-            # 调用 TTS 生成音频 (在线程池中运行以避免阻塞)
-            audio_data = await loop.run_in_executor(None, Amadeus.tts.generate_audio, ja_sentence)
-            if audio_data:
-                # 分片发送音频，避免超过 WebSocket 消息大小限制
-                CHUNK_SIZE = 30 * 1024  # 30KB, 是 3 的倍数
-                total_len = len(audio_data)
-
-                for i in range(0, total_len, CHUNK_SIZE):
-                    chunk_data = audio_data[i:i + CHUNK_SIZE]
-                    chunk_b64 = base64.b64encode(chunk_data).decode()
-                    await websocket.send_text(json.dumps({
-                        "type": "audio",
-                        "data": chunk_b64,
-                        "is_final": (i + CHUNK_SIZE >= total_len)
-                    }))
-
-                logging.info(f"已分片发送音频数据，总长度: {total_len}")
-            else:
-                logging.warning("TTS 生成失败")
+            next_sentence, _ = Amadeus.sentence_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        sentence += next_sentence
+        merged += 1
+        Amadeus.sentence_queue.task_done()
+    if merged:
+        logging.info(f"TTS 积压，合并了 {merged + 1} 句: {sentence}")
+        metrics.inc("tts_coalesce", merged, provider=Amadeus.tts.select)  # 被合并进前一句的句数
+    return sentence
 
-            Amadeus.sentence_queue.task_done()
 
+def shed_sentence(Amadeus, sentence):
+    """TTS 积压且这一句等得太久：跳过它的语音（文字已经发给前端了），避免越积越多"""
+    logging.warning(f"TTS 积压，跳过语音: {sentence}")
+    metrics.inc("tts_shed", provider=Amadeus.tts.select)
+
+
+async def synthesize_sentence(Amadeus, sentence, chunks, sentence_trace):
+    """
+    单句的翻译 + TTS，音频分段以 (bytes, 生成时间) 放入 chunks 队列，结束时放入 None
+    """
+    tts_provider = Amadeus.tts.select
+    try:
+        start = sentence_trace.mark("synthesize_start")
+        # 翻译成日语（async 翻译组件直接 await，同步组件由 Translator 自动放到线程池）
+        ja_sentence = await Amadeus.translator.translate(sentence)
+        translated_at = sentence_trace.mark("translated")
+        metrics.observe("translate", translated_at - start, provider=Amadeus.translator.select)
+        logging.info(f"翻译结果: {ja_sentence}")
+
+        if Amadeus.shed_after:
+            # 执行器积压时在这里等名额，等待时间连同之前排队的时间一起不超过 shed_after
+            remaining = Amadeus.shed_after - (time.perf_counter() - sentence_trace.marks["segmented"])
+            if not await Amadeus.tts.executor.wait_ready(remaining):
+                shed_sentence(Amadeus, sentence)
+                return
+
+        # 流式生成音频，同步的 TTS 组件由 TTS 服务放到线程池里执行
+        first_chunk = True
+        async for chunk in Amadeus.tts.generate_audio_stream(ja_sentence):
+            now = time.perf_counter()
+            if first_chunk:
+                sentence_trace.mark("tts_first_chunk", now)
+                metrics.observe("tts_first_chunk", now - translated_at, provider=tts_provider)
+                first_chunk = False
+            chunks.put_nowait((chunk, now))
+        if first_chunk:
+            logging.warning("TTS 生成失败")
+        metrics.observe("tts", sentence_trace.mark("tts_done") - translated_at, provider=tts_provider)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"句子合成出错: {e!r}")
+    finally:
+        chunks.put_nowait(None)
+
+
+async def send_audio_in_order(Amadeus, websocket):
+    """
+    按句子顺序取出合成任务，把它的音频分段边合成边发给前端
+    """
+    while True:
+        task, chunks, sentence_trace = await Amadeus.audio_queue.get()
+        Amadeus.sending = (task, chunks)
+        try:
+            await send_audio_stream(Amadeus, websocket, chunks, sentence_trace)
         except asyncio.CancelledError:
+            cancel_sentence(task, chunks)
             raise
         except Exception as e:
-            logging.error(f"句子队列处理出错: {e!r}")
+            logging.error(f"音频发送出错: {e!r}")
+        finally:
+            Amadeus.sending = None
+            Amadeus.lookahead_slots.release()
+            Amadeus.audio_queue.task_done()
+            Amadeus.sentence_queue.task_done()
+
+
+async def send_audio_stream(Amadeus, websocket, chunks, sentence_trace=None):
+    """
+    把一句话的音频分段发给前端，返回发送的总字节数。
+    分段按 CHUNK_SIZE 切片发送，避免超过 WebSocket 消息大小限制；
+    不足一片的部分先留着，等后续分段或结束时再发，这样除最后一片外每片长度都是 3 的倍数
+    （JSON 模式下前端会把各片 base64 直接拼接后再解码），最后一片带 is_final。
+    """
+    CHUNK_SIZE = 30 * 1024  # 30KB, 是 3 的倍数
+    buffer = b""
+    total_len = 0
+    start = None
+
+    while True:
+        item = await chunks.get()
+        if item is None:
+            break
+        chunk, produced_at = item
+        if start is None:
+            start = time.perf_counter()
+            # 这一句的第一段音频合成好之后，等待前面的句子发送完成的时间
+            metrics.observe("audio_order_wait", start - produced_at)
+            if sentence_trace:
+                sentence_trace.mark("send_start", start)
+                if sentence_trace.turn:
+                    sentence_trace.turn.mark("first_audio", start)
+        buffer += chunk
+        while len(buffer) > CHUNK_SIZE:
+            await send_audio_frame(Amadeus, websocket, buffer[:CHUNK_SIZE], False)
+            buffer = buffer[CHUNK_SIZE:]
+            total_len += CHUNK_SIZE
+
+    if start is None:
+        return 0
+    # 剩下的作为最后一片发送（被打断时也要发，让前端清空这一句的缓冲）
+    await send_audio_frame(Amadeus, websocket, buffer, True)
+    total_len += len(buffer)
+    sent_at = time.perf_counter()
+    if sentence_trace:
+        sentence_trace.mark("sent", sent_at)
+    metrics.observe("audio_send", sent_at - start, provider="binary" if Amadeus.binary_frames else "json")
+    logging.info(f"已分片发送音频数据，总长度: {total_len}")
+    return total_len
+
+
+async def send_audio_frame(Amadeus, websocket, data, is_final):
+    """
+    发送一片音频：协商了二进制帧的会话直接发送原始字节，否则走 base64 + JSON
+    """
+    if Amadeus.binary_frames:
+        await websocket.send_bytes(pack_frame(FRAME_AUDIO, Amadeus.audio_seq, data, is_final))
+        Amadeus.audio_seq += 1
+    else:
+        await websocket.send_text(json.dumps({
+            "type": "audio",
+            "data": base64.b64encode(data).decode(),
+            "is_final": is_final
+        }))
+
+
+def cancel_sentence(task, chunks):
+    """取消单句的合成任务，并放入结束标记（任务可能还没开始运行，不会自己放）"""
+    task.cancel()
+    chunks.put_nowait(None)
+
+
+def cancel_pending_audio(Amadeus):
+    """
+    打断时取消所有还没发送完的合成任务（包括正在发送的那一句）
+    """
+    Amadeus.pipeline_generation += 1
+    if Amadeus.sending:
+        cancel_sentence(*Amadeus.sending)
+    while not Amadeus.audio_queue.empty():
+        try:
+            task, chunks, _ = Amadeus.audio_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            break
+        cancel_sentence(task, chunks)
+        Amadeus.lookahead_slots.release()
+        Amadeus.audio_queue.task_done()
+        Amadeus.sentence_queue.task_done()
@@ -27,6 +27,7 @@ class ASR:
         # 获取对应模块的配置参数
         asr_config = config.get(select, {})
 
+        self.select = select
         self.provider = client_class(**asr_config)
 
     def __getattr__(self, name):
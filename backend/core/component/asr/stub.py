@@ -0,0 +1,38 @@
+import asyncio
+import logging
+
+
+class Client:
+    """
+    离线压测用的 ASR 桩组件：收到结束帧后等待固定延迟，回调一段固定的识别结果。
+    """
+
+    def __init__(self, text: str = "你好，今天天气怎么样？", finalize_delay: float = 0.1, **kwargs):
+        """
+        :param text: 每次返回的识别结果
+        :param finalize_delay: 收到结束帧到返回结果的延迟（模拟 ASR 出最终结果的耗时）
+        """
+        self.text = text
+        self.finalize_delay = finalize_delay
+        self.on_result = None
+        self.received_bytes = 0
+        self._tasks = set()
+
+    async def start(self, on_result_callback):
+        self.on_result = on_result_callback
+
+    async def send_audio(self, chunk):
+        self.received_bytes += len(chunk)
+
+    async def finish_audio(self):
+        # 和真实组件一样，结果是异步回调回来的，finish_audio 本身不等结果
+        task = asyncio.create_task(self._finalize())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _finalize(self):
+        await asyncio.sleep(self.finalize_delay)
+        logging.debug(f"ASR 桩组件收到 {self.received_bytes} 字节音频")
+        self.received_bytes = 0
+        if self.on_result:
+            await self.on_result(self.text)
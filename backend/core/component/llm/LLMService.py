@@ -9,6 +9,8 @@ class LLM:
             def generate(self, prompt: str) -> str:
                 ...
         generate方法用于生成文本响应。
+        组件的 generate 可以接受 stats 参数（字典），生成结束后填入本轮的 token 数和耗时统计。
+        组件可以选择实现 preload()，应用启动时调用，用来预先加载模型。
     """
     def __init__(self, config: dict) -> None:
         # 1. 获取配置中的模块名
@@ -30,6 +32,7 @@ class LLM:
         # 获取对应模块的配置参数
         llm_config = config.get(select, {})
 
+        self.select = select
         self.provider = client_class(**llm_config)
 
     def __getattr__(self, name):
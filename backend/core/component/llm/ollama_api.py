@@ -1,23 +1,103 @@
+import asyncio
 import aiohttp
 import json
 
 
 class Client:
-    def __init__(self, model: str, base_url: str = "http://localhost:11434"):
+    def __init__(self,
+                 model: str,
+                 base_url: str = "http://localhost:11434",
+                 max_connections: int = 10,
+                 keepalive_timeout: float = 60,
+                 connect_timeout: float = 10,
+                 read_timeout: float = 300,
+                 keep_alive: str | int | None = None,
+                 num_ctx: int = 0):
+        """
+        :param max_connections: 连接池中到 Ollama 的最大连接数
+        :param keepalive_timeout: 空闲连接保持时间（秒）
+        :param connect_timeout: 建立连接超时（秒）
+        :param read_timeout: 两次读取之间的超时（秒），流式生成时按行计算
+        :param keep_alive: 模型在 Ollama 中常驻多久（如 "30m"，-1 表示一直常驻），为空使用服务端默认的 5 分钟。
+            模型被卸载后不仅要重新加载，服务端缓存的上下文前缀也会一起丢掉
+        :param num_ctx: 上下文长度，0 使用服务端默认值。每次请求都要保持一致，改变会导致模型重新加载
+        """
         self.model = model
         self.base_url = base_url
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self._session = None
+        self._session_loop = None
 
-    async def generate(self, prompt: str | list, max_tokens: int = 512, temperature: float = 0.7):
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        获取长连接会话，第一次调用时创建。
+        aiohttp 的会话绑定在创建它的事件循环上，如果调用方换了事件循环（例如在别的线程里 asyncio.run），
+        就为新的循环重新创建一个。
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """关闭长连接会话，应用退出时调用"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def _options(self, max_tokens: int, temperature: float) -> dict:
+        options = {
+            "num_predict": max_tokens,
+            "temperature": temperature
+        }
+        if self.num_ctx:
+            options["num_ctx"] = self.num_ctx
+        return options
+
+    async def preload(self):
+        """
+        启动时预先把模型加载进 Ollama（不带 prompt 的请求只加载模型），
+        第一轮对话就不用等模型加载；配置了 keep_alive 时模型会一直常驻
+        """
+        payload = {"model": self.model}
+        if self.num_ctx:
+            payload["options"] = {"num_ctx": self.num_ctx}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        session = self._get_session()
+        async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+            response.raise_for_status()
+            await response.read()
+
+    async def generate(self, prompt: str | list, max_tokens: int = 512, temperature: float = 0.7,
+                       stats: dict | None = None):
+        """
+        流式生成文本
+
+        :param stats: 传入一个字典时，生成结束后填入本轮的统计：
+            prompt_eval_count/eval_count（token 数），prompt_eval_duration/eval_duration/
+            load_duration/total_duration（秒）。prompt_eval_count 只统计实际计算的 prompt token，
+            服务端前缀缓存命中的部分不算在内
+        """
         if isinstance(prompt, list):
             url = f"{self.base_url}/api/chat"
             payload = {
                 "model": self.model,
                 "messages": prompt,
                 "stream": True,
-                "options": {
-                    "num_predict": max_tokens,
-                    "temperature": temperature
-                }
+                "options": self._options(max_tokens, temperature)
             }
         else:
             url = f"{self.base_url}/api/generate"
@@ -25,25 +105,40 @@ class Client:
                 "model": self.model,
                 "prompt": prompt,
                 "stream": True,
-                "options": {
-                    "num_predict": max_tokens,
-                    "temperature": temperature
-                }
+                "options": self._options(max_tokens, temperature)
             }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as response:
-                response.raise_for_status()
-                while True:
-                    line = await response.content.readline()
-                    if not line:
-                        break
-                    if line:
-                        body = json.loads(line)
-                        if isinstance(prompt, list):
-                            token = body.get("message", {}).get("content", "")
-                        else:
-                            token = body.get("response", "")
+        session = self._get_session()
+        async with session.post(url, json=payload) as response:
+            response.raise_for_status()
+            while True:
+                line = await response.content.readline()
+                if not line:
+                    break
+                if line:
+                    body = json.loads(line)
+                    if isinstance(prompt, list):
+                        token = body.get("message", {}).get("content", "")
+                    else:
+                        token = body.get("response", "")
+                    if body.get("done", False):
+                        # 最后一个分块带有本轮的统计信息，先填好再交出最后一段文本
+                        if stats is not None:
+                            stats.update(self._parse_stats(body))
                         yield token
-                        if body.get("done", False):
-                            break
+                        break
+                    yield token
+
+    @staticmethod
+    def _parse_stats(body: dict) -> dict:
+        """从最后一个分块里取出统计信息，耗时从纳秒换算成秒"""
+        stats = {}
+        for key in ("prompt_eval_count", "eval_count"):
+            if key in body:
+                stats[key] = body[key]
+        for key in ("prompt_eval_duration", "eval_duration", "load_duration", "total_duration"):
+            if key in body:
+                stats[key] = body[key] / 1e9
+        return stats
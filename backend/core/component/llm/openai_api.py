@@ -15,7 +15,8 @@ class Client:
         )
         self.model = model
 
-    async def generate(self, prompt: str | list, max_tokens: int = 512, temperature: float = 0.7):
+    async def generate(self, prompt: str | list, max_tokens: int = 512, temperature: float = 0.7,
+                       stats: dict | None = None):
         messages = []
         if isinstance(prompt, str):
             messages = [{"role": "user", "content": prompt}]
@@ -32,6 +33,10 @@ class Client:
             )
 
             async for chunk in stream:
+                # 部分服务会在最后一个分块里返回 usage
+                if stats is not None and getattr(chunk, "usage", None):
+                    stats["prompt_eval_count"] = chunk.usage.prompt_tokens
+                    stats["eval_count"] = chunk.usage.completion_tokens
                 if chunk.choices and chunk.choices[0].delta.content:
                     yield chunk.choices[0].delta.content
         except Exception as e:
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+DEFAULT_RESPONSE = "你好，我是真帆。今天过得怎么样？有什么想聊的都可以告诉我。"
+
+
+class Client:
+    """
+    离线压测用的 LLM 桩组件，不需要 GPU 和 Ollama。
+    按固定速率逐字输出一段固定的回复，结果完全确定，便于对比不同配置下的流水线耗时。
+    """
+
+    def __init__(self,
+                 response: str = DEFAULT_RESPONSE,
+                 tokens_per_second: float = 50,
+                 first_token_delay: float = 0.2,
+                 chars_per_token: int = 1):
+        """
+        :param response: 每次返回的文本，多句话时可以测到断句和流水线
+        :param tokens_per_second: 输出速率
+        :param first_token_delay: 首个 token 之前的延迟（模拟 prefill）
+        :param chars_per_token: 每个 token 包含的字符数
+        """
+        self.response = response
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.chars_per_token = max(1, chars_per_token)
+
+    async def generate(self, prompt: str | list, max_tokens: int = 512, temperature: float = 0.7,
+                       stats: dict | None = None):
+        start = time.perf_counter()
+        await asyncio.sleep(self.first_token_delay)
+        prompt_done = time.perf_counter()
+
+        step = self.chars_per_token
+        tokens = [self.response[i:i + step] for i in range(0, len(self.response), step)][:max_tokens]
+        interval = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for token in tokens:
+            yield token
+            if interval:
+                await asyncio.sleep(interval)
+
+        if stats is not None:
+            prompt_text = prompt if isinstance(prompt, str) else "".join(m["content"] for m in prompt)
+            end = time.perf_counter()
+            stats.update({
+                "prompt_eval_count": len(prompt_text),
+                "prompt_eval_duration": prompt_done - start,
+                "eval_count": len(tokens),
+                "eval_duration": end - prompt_done,
+                "load_duration": 0.0,
+                "total_duration": end - start,
+            })
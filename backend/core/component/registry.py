@@ -0,0 +1,88 @@
+import time
+import inspect
+import logging
+from core.component.llm.LLMService import LLM
+from core.component.tts.TTSService import TTS
+from core.component.translator.TranslatorService import Translator
+from core.component.asr.ASRService import ASR
+from core.history import HistoryStore
+from core.summarizer import Summarizer
+from core.session_store import create_session_store
+
+
+class ComponentRegistry:
+    """
+    进程级的组件注册表，启动时按照配置把 LLM、TTS、翻译组件各构建一次，所有会话共享。
+    这样模型加载（比如 genie 的 load_character）不会出现在每次 WebSocket 连接的路径上，
+    内存也不会随着连接数成倍增长。
+
+    ASR 比较特殊：讯飞的 Client 内部保存了当前这路音频流的 ws 连接和回调，
+    没法在多个会话之间共享，所以这里只提供 create_asr 工厂方法，每个会话各自创建。
+
+    对话记录（HistoryStore）和对话摘要器（Summarizer）也在这里各创建一次，未启用时为 None。
+    会话存储（见 core/session_store.py）同样在这里创建，默认保存在内存里。
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.load_times = {}  # 组件名 -> 加载耗时（秒）
+
+        self.llm = self._build("llm", LLM)
+        self.tts = self._build("tts", TTS)
+        self.translator = self._build("translator", Translator)
+
+        history_config = dict(config.get("history", {}))
+        self.history = HistoryStore(**history_config) if history_config.pop("enabled", True) else None
+
+        summarizer_config = dict(config.get("summarizer", {}))
+        self.summarizer = Summarizer(**summarizer_config) if summarizer_config.pop("enabled", False) else None
+
+        self.sessions = create_session_store(config.get("session", {}))
+
+    def _build(self, name: str, service_class):
+        """构建单个组件并记录加载耗时"""
+        start = time.perf_counter()
+        component = service_class(self.config.get(name, {}))
+        elapsed = time.perf_counter() - start
+        self.load_times[name] = elapsed
+        logging.info(f"组件 {name} 加载完成，耗时 {elapsed:.3f}s")
+        return component
+
+    def create_asr(self):
+        """为单个会话创建 ASR 实例"""
+        return ASR(self.config.get("asr", {}))
+
+    async def preload(self):
+        """应用启动时让组件预先加载模型（组件实现了 preload 才会调用），再预热 TTS 缓存，失败只记录日志"""
+        for name in ("llm", "tts", "translator"):
+            preload = getattr(getattr(self, name).provider, "preload", None)
+            if preload is None:
+                continue
+            try:
+                result = preload()
+                if inspect.isawaitable(result):
+                    await result
+                logging.info(f"组件 {name} 预加载完成")
+            except Exception as e:
+                logging.warning(f"组件 {name} 预加载失败: {e}")
+        try:
+            await self.tts.prewarm()
+        except Exception as e:
+            logging.warning(f"TTS 缓存预热失败: {e}")
+
+    async def close(self):
+        """应用退出时释放各组件持有的连接等资源（组件实现了 close 才会调用）"""
+        for name in ("llm", "tts", "translator"):
+            close = getattr(getattr(self, name).provider, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.error(f"关闭组件 {name} 失败: {e}")
+        for name in ("tts", "translator"):
+            getattr(self, name).executor.shutdown()
+        if self.summarizer:
+            await self.summarizer.close()
@@ -1,4 +1,15 @@
+import asyncio
+import functools
+import hashlib
 import importlib
+import inspect
+import json
+import logging
+import re
+import unicodedata
+from core.util.cache import LRUCache, SQLiteCache
+from core.util.executor import ComponentExecutor
+from core.util.metrics import metrics
 
 
 class Translator:
@@ -8,7 +19,15 @@ class Translator:
         class Client:
             def translate(self, text: str, from_lang: str, to_lang: str) -> str:
                 ...
-        translate方法用于生成翻译响应。
+        translate方法用于生成翻译响应，既可以是普通函数，也可以是 async 函数。
+        组件还可以选择实现 translate_batch(texts: list, ...) -> list，一次翻译多句。
+
+        对外统一提供 async 的 translate / translate_batch：
+        async 组件直接 await，同步组件自动放到翻译专用的有界执行器里执行（配置 translator.executor，
+        见 core/util/executor.py），调用方不需要关心。
+
+        Translator 自带一层翻译缓存（配置 translator.cache），所有会话共享：
+        内存 LRU + 可选的 SQLite 持久化，常见句子不再走翻译组件。
     """
     def __init__(self, config: dict) -> None:
         # 1. 获取配置中的模块名
@@ -30,7 +49,105 @@ class Translator:
         # 获取对应模块的配置参数
         trans_config = config.get(select, {})
 
+        self.select = select
         self.provider = client_class(**trans_config)
+        self.executor = ComponentExecutor(
+            name="translator", component=("core.component.translator", select, trans_config),
+            **config.get("executor", {}))
+
+        # 5. 翻译缓存
+        self.memory_cache = None
+        self.db_cache = None
+        cache_config = config.get("cache", {})
+        if cache_config.get("enabled", False):
+            self.memory_cache = LRUCache(max_items=cache_config.get("max_items", 2000))
+            db_path = cache_config.get("db_path", "")
+            if db_path:
+                self.db_cache = SQLiteCache(db_path, table="translation_cache")
+            logging.info(f"翻译缓存已启用，持久化数据库: {db_path or '无'}")
+            metrics.register_cache("translator", self.cache_stats)
+
+    async def translate(self, text: str, *args, **kwargs) -> str:
+        """异步翻译单句，参数原样传给组件的 translate"""
+        if self.memory_cache is None:
+            return await self.executor.run_method(self.provider, "translate", text, *args, **kwargs)
+
+        key = self._cache_key(text, args, kwargs)
+        result = await self._cache_get(key)
+        if result is not None:
+            return result
+        result = await self.executor.run_method(self.provider, "translate", text, *args, **kwargs)
+        await self._cache_put(key, text, result)
+        return result
+
+    async def translate_batch(self, texts: list, *args, **kwargs) -> list:
+        """
+        异步翻译多句，返回与 texts 一一对应的列表。
+        已缓存的句子直接取缓存，剩下的：组件实现了 translate_batch 就一次性调用，否则并发地逐句翻译。
+        """
+        results = [None] * len(texts)
+        keys = [None] * len(texts)
+        if self.memory_cache is not None:
+            for i, text in enumerate(texts):
+                keys[i] = self._cache_key(text, args, kwargs)
+                results[i] = await self._cache_get(keys[i])
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        missing_texts = [texts[i] for i in missing]
+        if hasattr(self.provider, "translate_batch"):
+            translated = await self.executor.run_method(self.provider, "translate_batch", missing_texts, *args, **kwargs)
+        else:
+            translated = await asyncio.gather(
+                *(self.executor.run_method(self.provider, "translate", text, *args, **kwargs) for text in missing_texts))
+
+        for i, result in zip(missing, translated):
+            results[i] = result
+            if self.memory_cache is not None:
+                await self._cache_put(keys[i], texts[i], result)
+        return results
+
+    def _cache_key(self, text: str, args: tuple, kwargs: dict) -> str:
+        """缓存 key：组件名 + 归一化后的原文 + 语言对等参数"""
+        normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+        raw = json.dumps([self.select, normalized, args, kwargs], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _cache_get(self, key: str):
+        result = self.memory_cache.get(key)
+        if result is None and self.db_cache:
+            result = await self._call(self.db_cache.get, key)
+            if result is not None:
+                self.memory_cache.put(key, result)
+        return result
+
+    async def _cache_put(self, key: str, text: str, result: str):
+        # 翻译失败时组件一般会返回原文，这种结果不缓存，免得把失败结果持久化下来
+        if not result or result == text:
+            return
+        self.memory_cache.put(key, result)
+        if self.db_cache:
+            try:
+                await self._call(self.db_cache.put, key, result)
+            except Exception as e:
+                logging.warning(f"翻译缓存写入数据库失败: {e}")
+
+    def cache_stats(self) -> dict:
+        """缓存命中统计，未启用缓存时返回空字典"""
+        stats = {}
+        if self.memory_cache:
+            stats["memory"] = self.memory_cache.stats()
+        if self.db_cache:
+            stats["db"] = self.db_cache.stats()
+        return stats
+
+    async def _call(self, func, *args, **kwargs):
+        """缓存读写用：async 函数直接 await，同步函数放到默认线程池，避免阻塞事件循环"""
+        if inspect.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
 
     def __getattr__(self, name):
         """
@@ -1,25 +1,92 @@
+import threading
+import time
 import argostranslate.package
 import argostranslate.translate
-from langdetect import detect
+from langdetect import detect, DetectorFactory
 import logging
+from core.util.cache import LRUCache
+
+# 固定 langdetect 的随机种子，同一段文本每次检测结果一致，检测结果才能缓存
+DetectorFactory.seed = 0
 
 
 class Client:
     """
     Argos Translate 离线翻译客户端，自动识别源语言并翻译。
+    语言对只在第一次用到时解析一次，之后直接复用内存里的翻译对象；
+    优先使用本地已安装的模型包，只有本地没有且允许下载时才联网。
     """
 
     def __init__(self, **kwargs):
         # 支持配置目标语言，默认日语
         self.to_lang = kwargs.get("to_lang", "ja")
-        self.model_installed = False
+        # 配置了源语言就不再做语言检测
+        self.from_lang = kwargs.get("from_lang", "")
+        # 本地没有对应模型包时是否联网下载
+        self.auto_download = kwargs.get("auto_download", True)
+        # 下载失败（网络错误等）后隔多久再重试（秒）
+        self.retry_interval = kwargs.get("retry_interval", 300)
+
+        self._translations = {}  # (from_lang, to_lang) -> 翻译对象，None 表示确认没有可用模型
+        self._retry_at = {}      # (from_lang, to_lang) -> 下载失败后，下次允许重试的时间（monotonic）
+        self._lock = threading.Lock()
+        self._index_updated = False
+        self._detect_cache = LRUCache(max_items=kwargs.get("detect_cache_size", 1024))
         self.translate("你好")  # 预加载模型
 
-    def _ensure_model(self, from_lang, to_lang):
-        """尝试加载或下载模型，支持动态语言对"""
-        argostranslate.package.update_package_index()
-        available_packages = argostranslate.package.get_available_packages()
+    def _get_translation(self, from_lang, to_lang):
+        """
+        获取语言对的翻译对象。加载成功和确认没有这个模型包的结果会一直缓存；
+        下载失败（网络错误等）不缓存，retry_interval 秒内直接返回 None，之后再重试
+        """
+        pair = (from_lang, to_lang)
+        if pair in self._translations:
+            return self._translations[pair]
+        if self._retry_at.get(pair, 0) > time.monotonic():
+            return None
+
+        with self._lock:
+            if pair in self._translations:
+                return self._translations[pair]
+            if self._retry_at.get(pair, 0) > time.monotonic():
+                return None
+
+            translation = self._load_installed(from_lang, to_lang)
+            if translation is None and self.auto_download:
+                downloaded = self._download_package(from_lang, to_lang)
+                if downloaded is None:
+                    self._retry_at[pair] = time.monotonic() + self.retry_interval
+                    return None
+                if downloaded:
+                    translation = self._load_installed(from_lang, to_lang)
+
+            if translation is None:
+                logging.warning(f"Argos Translate: 未找到 {from_lang} 到 {to_lang} 的模型包。")
+            else:
+                logging.info(f"Argos Translate: 已加载 {from_lang} 到 {to_lang} 的模型包。")
+            self._translations[pair] = translation
+            self._retry_at.pop(pair, None)
+            return translation
+
+    def _load_installed(self, from_lang, to_lang):
+        """从本地已安装的模型包中查找翻译对象，不联网"""
+        languages = {lang.code: lang for lang in argostranslate.translate.get_installed_languages()}
+        if from_lang not in languages or to_lang not in languages:
+            return None
+        return languages[from_lang].get_translation(languages[to_lang])
+
+    def _download_package(self, from_lang, to_lang):
+        """
+        联网下载并安装模型包，包索引在整个进程里只成功更新一次
+
+        返回:
+            bool | None: True 表示已安装，False 表示没有这个语言对的模型包，None 表示下载或安装失败
+        """
         try:
+            if not self._index_updated:
+                argostranslate.package.update_package_index()
+                self._index_updated = True
+            available_packages = argostranslate.package.get_available_packages()
             package_to_install = next(
                 filter(
                     lambda x: x.from_code == from_lang and x.to_code == to_lang, available_packages
@@ -27,36 +94,52 @@ class Client:
             )
             argostranslate.package.install_from_path(
                 package_to_install.download())
-            logging.info(f"Argos Translate: 已加载 {from_lang} 到 {to_lang} 的模型包。")
             return True
         except StopIteration:
-            logging.warning(f"Argos Translate: 未找到 {from_lang} 到 {to_lang} 的模型包。")
             return False
+        except Exception as e:
+            logging.warning(f"Argos Translate: 下载 {from_lang} 到 {to_lang} 的模型包失败，"
+                            f"{self.retry_interval} 秒后重试: {e}")
+            return None
 
-    def translate(self, text: str, from_lang: str = '', to_lang: str = 'ja') -> str:
+    def _detect_lang(self, text: str) -> str:
+        """检测源语言，结果按文本缓存"""
+        lang = self._detect_cache.get(text)
+        if lang is None:
+            lang = detect(text)
+            self._detect_cache.put(text, lang)
+        return lang
+
+    def translate(self, text: str, from_lang: str = '', to_lang: str = '') -> str:
         # 处理空文本
         if not text or not text.strip():
             logging.warning("翻译文本为空，返回原文")
             return text
-        
-        # 自动检测源语言
+
+        # 自动检测源语言（配置了 from_lang 时跳过）
+        if not from_lang:
+            from_lang = self.from_lang
         if not from_lang:
             try:
-                from_lang = detect(text)
+                from_lang = self._detect_lang(text)
             except Exception as e:
                 logging.warning(f"语言检测失败: {e}，返回原文")
                 return text
-        
+
         if not to_lang:
             to_lang = self.to_lang
-        
-        # 尝试加载模型，若失败则返回原文
-        if not self._ensure_model(from_lang, to_lang):
+
+        if from_lang == to_lang:
+            return text
+
+        # 获取翻译对象，若没有可用模型则返回原文
+        translation = self._get_translation(from_lang, to_lang)
+        if translation is None:
             logging.warning(f"无法加载 {from_lang} 到 {to_lang} 的模型，返回原文")
             return text
-        
+
         try:
-            return argostranslate.translate.translate(text, from_lang, to_lang)
+            return translation.translate(text)
         except Exception as e:
             logging.error(f"翻译失败: {e}，返回原文")
             return text
@@ -1,34 +1,90 @@
-import requests
+import asyncio
+import json
 import random
 from hashlib import md5
 import logging
+from core.util.http import HttpClient
+
+# 百度翻译里值得重试的错误码：52001 请求超时，52002 系统错误，54003 访问频率受限
+RETRY_ERROR_CODES = {"52001", "52002", "54003"}
+
 
 class Client:
-    def __init__(self, appid: str, appkey: str, endpoint: str = 'http://api.fanyi.baidu.com'):
+    def __init__(self,
+                 appid: str,
+                 appkey: str,
+                 endpoint: str = 'http://api.fanyi.baidu.com',
+                 max_connections: int = 4,
+                 keepalive_timeout: float = 60,
+                 connect_timeout: float = 3,
+                 read_timeout: float = 5,
+                 retries: int = 2,
+                 retry_backoff: float = 0.3):
+        """
+        :param max_connections: 到百度翻译接口的最大连接数
+        :param keepalive_timeout: 空闲连接保持时间（秒），长连接省掉每次的 TCP/TLS 握手
+        :param connect_timeout: 建立连接超时（秒）
+        :param read_timeout: 等待响应的超时（秒）
+        :param retries: 连接失败、超时、5xx 或可重试的错误码（见 RETRY_ERROR_CODES）时最多重试几次
+        :param retry_backoff: 第一次重试前的等待时间（秒），之后每次翻倍
+        """
         self.appid = appid
         self.appkey = appkey
         self.endpoint = endpoint
         self.path = '/api/trans/vip/translate'
         self.url = self.endpoint + self.path
+        self.retries = retries
+        self.http = HttpClient(
+            max_connections=max_connections,
+            keepalive_timeout=keepalive_timeout,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            total_timeout=connect_timeout + read_timeout,
+            retries=retries,
+            backoff=retry_backoff,
+        )
+
+    async def close(self):
+        """关闭长连接，应用退出时调用"""
+        await self.http.close()
 
-    def translate(self, text: str, from_lang: str = 'auto', to_lang: str = 'jp') -> str:
-        salt = random.randint(32768, 65536)
-        sign = md5((self.appid + text + str(salt) + self.appkey).encode('utf-8')).hexdigest()
+    async def translate(self, text: str, from_lang: str = 'auto', to_lang: str = 'jp') -> str:
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
-        payload = {
-            'appid': self.appid,
-            'q': text,
-            'from': from_lang,
-            'to': to_lang,
-            'salt': salt,
-            'sign': sign
-        }
-        try:
-            r = requests.post(self.url, params=payload, headers=headers, timeout=5)
-            result = r.json()
+        for attempt in range(self.retries + 1):
+            # 每次请求都要重新生成 salt 和签名
+            salt = random.randint(32768, 65536)
+            sign = md5((self.appid + text + str(salt) + self.appkey).encode('utf-8')).hexdigest()
+            payload = {
+                'appid': self.appid,
+                'q': text,
+                'from': from_lang,
+                'to': to_lang,
+                'salt': salt,
+                'sign': sign
+            }
+            try:
+                _, body = await self.http.request("POST", self.url, data=payload, headers=headers)
+                result = json.loads(body)
+            except Exception as e:
+                logging.warning(f"百度翻译请求失败: {e!r}")
+                return text
             if 'trans_result' in result:
                 return '\n'.join([item['dst'] for item in result['trans_result']])
-            else:
+            if str(result.get('error_code')) not in RETRY_ERROR_CODES or attempt == self.retries:
+                logging.warning(f"百度翻译返回错误: {result.get('error_code')} {result.get('error_msg')}")
                 return text
-        except Exception as e:
-            return text
+            await asyncio.sleep(self.http.backoff_delay(attempt))
+        return text
+
+    async def translate_batch(self, texts: list, from_lang: str = 'auto', to_lang: str = 'jp') -> list:
+        """
+        一次请求翻译多句：百度接口按换行拆分 q，trans_result 与每一行一一对应。
+        返回条数对不上时退回逐句翻译（逐句顺序请求，避免触发接口的频率限制）。
+        """
+        if not texts:
+            return []
+        joined = await self.translate('\n'.join(texts), from_lang, to_lang)
+        lines = joined.split('\n')
+        if len(lines) != len(texts):
+            return [await self.translate(text, from_lang, to_lang) for text in texts]
+        return lines
@@ -1,4 +1,3 @@
-import asyncio
 from core.component.llm.ollama_api import Client as OllamaClient
 
 
@@ -19,7 +18,7 @@ class Client:
         self.ollama_client = OllamaClient(model=model, base_url=base_url)
         self.model = model
 
-    def translate(self, text: str, from_lang: str = "auto", to_lang: str = "ja") -> str:
+    async def translate(self, text: str, from_lang: str = "auto", to_lang: str = "ja") -> str:
         """
         翻译文本。
 
@@ -38,19 +37,19 @@ class Client:
 
 直接输出翻译结果，不要添加任何解释或额外内容。"""
 
-        # 异步调用 Ollama API
-        async def _translate_async():
+        # 直接在调用方的事件循环里请求 Ollama，复用客户端的连接池
+        try:
             response = ""
             async for token in self.ollama_client.generate(prompt, max_tokens=512, temperature=0.3):
                 response += token
             return response.strip()
-
-        # 运行异步任务
-        try:
-            return asyncio.run(_translate_async())
         except Exception as e:
             raise RuntimeError(f"Ollama 翻译失败: {e}")
 
+    async def close(self):
+        """关闭内部 Ollama 客户端的连接池"""
+        await self.ollama_client.close()
+
     def _get_lang_name(self, lang_code: str) -> str:
         """
         将语言代码转换为中文名称。
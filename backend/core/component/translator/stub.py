@@ -0,0 +1,20 @@
+import asyncio
+
+
+class Client:
+    """
+    离线压测用的翻译桩组件，等待固定延迟后返回加了前缀的原文。
+    """
+
+    def __init__(self, delay: float = 0.05, prefix: str = "[ja] ", **kwargs):
+        """
+        :param delay: 每次翻译的耗时（秒）
+        :param prefix: 加在译文前面的前缀。译文和原文相同时翻译缓存不会缓存（当作翻译失败），
+            所以压测翻译缓存时前缀不能为空
+        """
+        self.delay = delay
+        self.prefix = prefix
+
+    async def translate(self, text: str, from_lang: str = "", to_lang: str = "") -> str:
+        await asyncio.sleep(self.delay)
+        return f"{self.prefix}{text}"
@@ -1,4 +1,14 @@
+import asyncio
+import hashlib
 import importlib
+import inspect
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from core.util.cache import LRUCache, DiskCache
+from core.util.executor import ComponentExecutor
+from core.util.batcher import MicroBatcher
+from core.util.metrics import metrics
 
 
 class TTS:
@@ -8,7 +18,17 @@ class TTS:
         class Client:
             def generate_audio(self, text: str, **kwargs) -> bytes:
                 ...
-        generate_audio方法用于生成音频数据。
+        generate_audio方法用于生成音频数据，可以是普通函数（在 TTS 专用的执行器里执行）也可以是 async 函数（直接 await）。
+        组件可以选择实现 generate_audio_stream(text, **kwargs)，普通生成器或 async 生成器都可以，
+        边合成边 yield 音频分段，所有分段拼起来是完整的音频（配置 tts.stream 为 true 时使用）。
+        组件可以选择实现 generate_audio_batch(texts: list, **kwargs) -> list，一次合成多句，
+        配置 tts.batch 开启后，各个会话同时等待合成的句子会攒成一批调用它（见 core/util/batcher.py）。
+        组件可以选择实现 cache_identity() -> dict，返回影响音色的参数（角色、参考音频等），
+        用作缓存 key 的一部分；没有实现时使用该组件的配置。
+
+        TTS 自带一层音频缓存（配置 tts.cache），同一句话、同样的音色参数只合成一次。
+        合成任务在 TTS 专用的有界执行器里执行（配置 tts.executor，见 core/util/executor.py），
+        不和翻译等组件抢线程，积压时调用方会等待。
     """
     def __init__(self, config: dict) -> None:
         # 1. 获取配置中的模块名
@@ -30,7 +50,181 @@ class TTS:
         # 获取对应模块的配置参数
         tts_config = config.get(select, {})
 
+        self.select = select
+        self.provider_config = tts_config
+        self.stream = config.get("stream", False)
         self.provider = client_class(**tts_config)
+        self.executor = ComponentExecutor(
+            name="tts", component=("core.component.tts", select, tts_config), **config.get("executor", {}))
+
+        # 5. 微批合成：只有组件实现了 generate_audio_batch 才生效
+        self.batcher = None
+        batch_config = dict(config.get("batch", {}))
+        if batch_config.pop("enabled", False):
+            if hasattr(self.provider, "generate_audio_batch"):
+                self.batcher = MicroBatcher(self._generate_batch, name="tts", **batch_config)
+            else:
+                logging.warning(f"TTS 组件 {select} 不支持批量合成，tts.batch 不生效")
+
+        # 6. 音频缓存
+        self.memory_cache = None
+        self.disk_cache = None
+        self._disk_writer = None
+        self.prewarm_phrases = []
+        cache_config = config.get("cache", {})
+        if cache_config.get("enabled", False):
+            self._init_cache(cache_config)
+
+    def _init_cache(self, cache_config: dict):
+        """
+        初始化内存 LRU 缓存和可选的磁盘缓存，内存淘汰下来的音频会落到磁盘上。
+        写内存缓存会在事件循环上发生，所以落盘交给单独的一个后台线程，写文件和清理目录都不阻塞事件循环
+        """
+        disk_dir = cache_config.get("disk_dir", "")
+        if disk_dir:
+            self.disk_cache = DiskCache(
+                disk_dir, max_bytes=int(cache_config.get("max_disk_mb", 512) * 1024 * 1024))
+            # 只用一个线程，落盘按淘汰顺序串行执行
+            self._disk_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-cache")
+        self.memory_cache = LRUCache(
+            max_bytes=int(cache_config.get("max_memory_mb", 64) * 1024 * 1024),
+            on_evict=self._spill_to_disk,
+        )
+        logging.info(f"TTS 音频缓存已启用，磁盘目录: {disk_dir or '无'}")
+        metrics.register_cache("tts", self.cache_stats)
+
+        # 预热要调用组件合成音频，组件可能是 async 的，所以放到应用启动时（ComponentRegistry.preload）再做
+        self.prewarm_phrases = cache_config.get("prewarm", [])
+
+    def _spill_to_disk(self, key: str, audio: bytes):
+        """内存缓存的淘汰回调：交给后台线程写磁盘，立即返回"""
+        if self.disk_cache:
+            self._disk_writer.submit(self._write_disk, key, audio)
+
+    def _write_disk(self, key: str, audio: bytes):
+        try:
+            self.disk_cache.put(key, audio)
+        except OSError as e:
+            logging.warning(f"TTS 缓存写入磁盘失败: {e}")
+
+    def _cache_key(self, text: str, kwargs: dict) -> str:
+        """缓存 key：组件名 + 音色参数 + 文本 + 合成参数 的哈希"""
+        identity = getattr(self.provider, "cache_identity", None)
+        key_data = {
+            "provider": self.select,
+            "voice": identity() if identity else self.provider_config,
+            "text": text,
+            "params": kwargs,
+        }
+        raw = json.dumps(key_data, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def generate_audio(self, text: str, **kwargs) -> bytes | None:
+        """生成音频，命中缓存时直接返回，参数原样传给组件"""
+        if self.memory_cache is None:
+            return await self._call(text, kwargs)
+
+        key = self._cache_key(text, kwargs)
+        loop = asyncio.get_running_loop()
+        audio = await loop.run_in_executor(None, self._cache_get, key)
+        if audio is not None:
+            return audio
+        audio = await self._call(text, kwargs)
+        if audio:
+            self.memory_cache.put(key, audio)
+        return audio
+
+    async def _call(self, text: str, kwargs: dict) -> bytes | None:
+        """
+        在执行器里调用组件的 generate_audio：async 函数直接 await，普通函数放到线程池或进程池。
+        开启了微批时交给 batcher，和同时到达的其他句子一起合成
+        """
+        if self.batcher:
+            return await self.batcher.submit(text, **kwargs)
+        return await self.executor.run_method(self.provider, "generate_audio", text, **kwargs)
+
+    async def _generate_batch(self, texts: list, **kwargs) -> list:
+        """一批句子一起合成，整批只占用执行器的一个名额"""
+        return await self.executor.run_method(self.provider, "generate_audio_batch", texts, **kwargs)
+
+    async def generate_audio_stream(self, text: str, **kwargs):
+        """
+        流式生成音频，逐段 yield bytes。
+        开启了 tts.stream 且组件实现了 generate_audio_stream 时边合成边输出，
+        否则调用 generate_audio，整句一次性输出。
+        同步的流式生成器没法跨进程，执行器是进程池时也按整句输出。
+        """
+        loop = asyncio.get_running_loop()
+        stream = getattr(self.provider, "generate_audio_stream", None)
+        if stream is not None and self.executor.kind == "process" and not inspect.isasyncgenfunction(stream):
+            stream = None
+        if not self.stream or stream is None:
+            audio = await self.generate_audio(text, **kwargs)
+            if audio:
+                yield audio
+            return
+
+        key = None
+        if self.memory_cache is not None:
+            key = self._cache_key(text, kwargs)
+            audio = await loop.run_in_executor(None, self._cache_get, key)
+            if audio is not None:
+                yield audio
+                return
+
+        chunks = []
+        # 整个流式合成期间占用一个名额
+        async with self.executor.slot():
+            async for chunk in self._iterate(stream(text, **kwargs)):
+                chunks.append(chunk)
+                yield chunk
+        # 完整合成之后才写缓存，中途被取消的不缓存
+        if key and chunks:
+            self.memory_cache.put(key, b"".join(chunks))
+
+    async def _iterate(self, stream):
+        """统一遍历 async 生成器和普通生成器，普通生成器的每一步放到执行器的线程池里执行"""
+        if inspect.isasyncgen(stream):
+            async for chunk in stream:
+                if chunk:
+                    yield chunk
+            return
+        while True:
+            chunk = await self.executor.call(next, stream, None)
+            if chunk is None:
+                break
+            if chunk:
+                yield chunk
+
+    def _cache_get(self, key: str):
+        """先查内存再查磁盘，磁盘命中的放回内存"""
+        audio = self.memory_cache.get(key)
+        if audio is None and self.disk_cache:
+            audio = self.disk_cache.get(key)
+            if audio is not None:
+                self.memory_cache.put(key, audio)
+        return audio
+
+    async def prewarm(self, phrases: list | None = None):
+        """
+        预先合成一批常用句子放进缓存（phrases 是 TTS 的输入文本，也就是翻译后的句子），
+        不传时使用配置 tts.cache.prewarm。未启用缓存时什么也不做
+        """
+        phrases = self.prewarm_phrases if phrases is None else phrases
+        if self.memory_cache is None or not phrases:
+            return
+        for phrase in phrases:
+            await self.generate_audio(phrase)
+        logging.info(f"TTS 缓存预热完成，共 {len(phrases)} 句")
+
+    def cache_stats(self) -> dict:
+        """缓存命中统计，未启用缓存时返回空字典"""
+        stats = {}
+        if self.memory_cache:
+            stats["memory"] = self.memory_cache.stats()
+        if self.disk_cache:
+            stats["disk"] = self.disk_cache.stats()
+        return stats
 
     def __getattr__(self, name):
         """
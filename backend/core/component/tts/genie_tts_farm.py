@@ -0,0 +1,315 @@
+import os
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import signal
+import threading
+from collections import deque
+from multiprocessing import connection, resource_tracker, shared_memory
+from core.component.tts.genie_tts_service import Client as GenieClient
+
+
+def _worker_main(genie_config: dict, conn):
+    """
+    worker 进程：加载一次角色模型，然后循环处理主进程通过管道发来的合成任务。
+    合成好的音频写进一块新建的共享内存，管道里只传共享内存的名字和长度，音频本身不经过 pickle；
+    共享内存由主进程读完后释放
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C 由主进程处理，worker 等主进程通知退出
+    try:
+        client = GenieClient(**genie_config)
+    except Exception as e:
+        conn.send(("failed", repr(e)))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        job_id, text, kwargs = job
+        audio = client.generate_audio(text, **kwargs)
+        if not audio:
+            conn.send(("done", job_id, None, 0))
+            continue
+        shm = shared_memory.SharedMemory(create=True, size=len(audio))
+        shm.buf[:len(audio)] = audio
+        conn.send(("done", job_id, shm.name, len(audio)))
+        shm.close()
+    client.close()
+
+
+class Client:
+    """
+    多进程的 Genie TTS：启动 workers 个 worker 进程，每个进程各自 load_character 一次，
+    ONNX 推理分散到多个 CPU 核上，也不占用 WebSocket 所在进程的 GIL。
+
+    - 任务先在主进程里排队，再通过管道发给空闲的 worker（每个 worker 一条管道，一次只做一句），
+      音频通过共享内存传回（见 _worker_main）
+    - 主进程里的一个线程等待各条管道的结果，唤醒对应的 await；还在排队时就被取消的任务不再发给 worker
+    - worker 意外退出时，它手上的任务立即返回 None，然后重启这个 worker
+    - 加载模型失败的 worker 不再重启；所有 worker 都失败时 preload 立即报错，之后的合成直接返回 None，不再排队等超时
+    - 只支持整句合成（没有 generate_audio_stream）
+
+    除下面几个参数外，其余参数原样传给每个 worker 里的 genie_tts_service.Client。
+    同时进行的合成数受 tts.executor 的名额限制，max_workers 应不小于 workers，否则有的 worker 会一直空闲。
+
+    :param workers: worker 进程数，0 表示 CPU 核数的一半
+    :param job_timeout: 单句合成超时（秒，包括排队时间）
+    :param load_timeout: preload 时等待所有 worker 加载完模型的时间（秒）
+    :param start_method: 进程启动方式（fork/spawn/forkserver），留空使用平台默认值。
+        用 spawn 且通过 python main.py 启动时，worker 会重新导入 main.py
+    """
+
+    def __init__(self,
+                 workers: int = 0,
+                 job_timeout: float = 60,
+                 load_timeout: float = 300,
+                 start_method: str = "",
+                 **genie_config):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.job_timeout = job_timeout
+        self.load_timeout = load_timeout
+        self.genie_config = genie_config
+        self._context = multiprocessing.get_context(start_method or None)
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()  # 保护下面的任务队列和 worker 状态，事件循环和结果线程都会访问
+        self._queue = deque()  # 等待空闲 worker 的任务：(job_id, text, kwargs)
+        self._pending = {}  # job_id -> (事件循环, future)
+        self._processes = [None] * self.workers
+        self._conns = [None] * self.workers
+        self._busy = [None] * self.workers  # 每个 worker 正在做的 job_id
+        self._ready = set()  # 已经加载完模型的 worker
+        self._failed = set()  # 加载失败、不会再重启的 worker
+        self._settled = threading.Event()  # 每个 worker 都已经加载完或者失败了
+        self._closing = False
+
+        if multiprocessing.current_process().name.startswith("genie-tts-"):
+            # spawn 方式下 worker 会重新导入主模块，这里不能再启动一批 worker
+            logging.warning("在子进程中创建 genie_tts_farm，不启动 worker")
+            self._closing = True
+            return
+
+        # 共享内存由 worker 创建、主进程释放，两边必须用同一个 resource_tracker，所以先在主进程里启动它
+        resource_tracker.ensure_running()
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+        self._reader = threading.Thread(target=self._read_results, name="genie-farm-results", daemon=True)
+        self._reader.start()
+        logging.info(f"Genie TTS 进程池已启动，共 {self.workers} 个 worker")
+
+    def _start_worker(self, worker_id: int):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.genie_config, child_conn),
+            name=f"genie-tts-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()  # 主进程不再持有子进程那一端，worker 退出后这边才能读到 EOF
+        self._processes[worker_id] = process
+        self._conns[worker_id] = parent_conn
+
+    def _read_results(self):
+        """结果线程：等待各个 worker 的管道和进程状态，处理合成结果和 worker 退出"""
+        while not self._closing:
+            waitables = {}
+            for worker_id, process in enumerate(self._processes):
+                if process is not None:
+                    waitables[self._conns[worker_id]] = (worker_id, process)
+                    waitables[process.sentinel] = (worker_id, process)
+            for ready in connection.wait(list(waitables), timeout=1):
+                worker_id, process = waitables[ready]
+                if self._processes[worker_id] is not process:
+                    continue  # 同一轮里已经按退出处理过（可能已经重启了新的 worker）
+                if ready is self._conns[worker_id]:
+                    try:
+                        message = ready.recv()
+                    except (EOFError, OSError):
+                        self._on_worker_exit(worker_id)
+                        continue
+                    self._on_message(worker_id, message)
+                elif not self._conns[worker_id].poll():
+                    # 管道里没有剩下的结果才按退出处理，有的话先读结果，下一轮再处理退出
+                    self._on_worker_exit(worker_id)
+
+    def _on_message(self, worker_id: int, message: tuple):
+        kind = message[0]
+        if kind == "done":
+            _, job_id, name, size = message
+            audio = self._take_audio(name, size) if name else None
+            with self._lock:
+                self._busy[worker_id] = None
+                waiter = self._pending.pop(job_id, None)
+                self._dispatch()
+            if waiter:
+                _resolve(waiter, audio)
+        elif kind == "ready":
+            logging.info(f"Genie TTS worker {worker_id}（pid {message[1]}）模型加载完成")
+            with self._lock:
+                self._ready.add(worker_id)
+                self._check_settled()
+                self._dispatch()
+        elif kind == "failed":
+            logging.error(f"Genie TTS worker {worker_id} 加载模型失败: {message[1]}")
+            self._mark_failed(worker_id)
+
+    def _on_worker_exit(self, worker_id: int):
+        """worker 退出：手上的任务返回 None；加载过模型的 worker 重启，加载失败的不再重启，避免反复失败"""
+        process = self._processes[worker_id]
+        process.join(timeout=1)
+        self._conns[worker_id].close()
+        with self._lock:
+            job_id, self._busy[worker_id] = self._busy[worker_id], None
+            waiter = self._pending.pop(job_id, None) if job_id is not None else None
+            loaded = worker_id in self._ready
+            self._ready.discard(worker_id)
+            self._processes[worker_id] = None
+            self._conns[worker_id] = None
+        if waiter:
+            _resolve(waiter, None)
+        if self._closing:
+            return
+        if loaded:
+            logging.error(f"Genie TTS worker {worker_id} 意外退出（exitcode {process.exitcode}），正在重启")
+            self._start_worker(worker_id)
+        else:
+            logging.error(f"Genie TTS worker {worker_id} 退出（exitcode {process.exitcode}），不再重启")
+            self._mark_failed(worker_id)
+
+    def _mark_failed(self, worker_id: int):
+        """记下加载失败的 worker；所有 worker 都失败时，排队中的任务不会再有人处理，立即返回 None"""
+        with self._lock:
+            self._failed.add(worker_id)
+            self._check_settled()
+            waiters = []
+            if self._dead:
+                waiters = list(self._pending.values())
+                self._pending.clear()
+                self._queue.clear()
+        for waiter in waiters:
+            _resolve(waiter, None)
+
+    @property
+    def _dead(self) -> bool:
+        """所有 worker 都加载失败了，不会再有 worker 可用"""
+        return len(self._failed) == self.workers
+
+    def _check_settled(self):
+        """每个 worker 都有了结果（加载完或失败）时唤醒 preload（调用方持有 self._lock）"""
+        if len(self._ready | self._failed) == self.workers:
+            self._settled.set()
+
+    def _dispatch(self):
+        """把排队的任务发给空闲且已经加载完模型的 worker（调用方持有 self._lock）"""
+        for worker_id in self._ready:
+            if self._busy[worker_id] is not None:
+                continue
+            while self._queue:
+                job = self._queue.popleft()
+                if job[0] not in self._pending:
+                    continue  # 排队期间已经被取消或超时
+                self._conns[worker_id].send(job)
+                self._busy[worker_id] = job[0]
+                break
+            if not self._queue:
+                return
+
+    def _take_audio(self, name: str, size: int) -> bytes | None:
+        """从 worker 创建的共享内存里取出音频，然后释放这块共享内存"""
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            logging.error(f"Genie TTS 共享内存不存在: {name}")
+            return None
+        try:
+            return bytes(shm.buf[:size])
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def preload(self):
+        """等待所有 worker 加载完模型（或失败），第一句话不用等模型加载；一个都没加载成功时报错"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._settled.wait, self.load_timeout)
+        if self._dead:
+            raise RuntimeError(f"Genie TTS 进程池的 {self.workers} 个 worker 都加载失败")
+        if len(self._ready) < self.workers:
+            logging.warning(f"Genie TTS 进程池只有 {len(self._ready)}/{self.workers} 个 worker 加载完成")
+
+    async def generate_audio(self, text: str, **kwargs) -> bytes | None:
+        """
+        把合成任务交给空闲的 worker，等待音频返回
+        :param text: 要合成的文本
+        :return: 音频二进制数据（WAV 格式），失败或超时返回 None
+        """
+        if self._closing or self._dead:
+            return None
+        loop = asyncio.get_running_loop()
+        job_id = next(self._job_ids)
+        future = loop.create_future()
+        with self._lock:
+            if self._dead:
+                return None
+            self._pending[job_id] = (loop, future)
+            self._queue.append((job_id, text, kwargs))
+            self._dispatch()
+        try:
+            return await asyncio.wait_for(future, self.job_timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"Genie TTS 合成超时: {text[:50]}")
+            return None
+        finally:
+            # 已经发给 worker 的任务还是会做完，结果线程照常释放它的共享内存
+            with self._lock:
+                self._pending.pop(job_id, None)
+
+    def cache_identity(self) -> dict:
+        """影响音色的参数，与 genie_tts_service 相同"""
+        return {
+            "character_name": self.genie_config.get("character_name", "maho"),
+            "onnx_model_dir": self.genie_config.get("onnx_model_dir", ""),
+            "language": self.genie_config.get("language", "ja"),
+            "reference_audio_path": self.genie_config.get("reference_audio_path", ""),
+            "reference_audio_text": self.genie_config.get("reference_audio_text", ""),
+        }
+
+    def close(self):
+        """通知所有 worker 退出，应用退出时调用"""
+        if self._closing:
+            return
+        self._closing = True
+        self._reader.join(timeout=2)
+        for conn in self._conns:
+            if conn is not None:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        with self._lock:
+            waiters = list(self._pending.values())
+            self._pending.clear()
+        for waiter in waiters:
+            _resolve(waiter, None)
+
+
+def _resolve(waiter: tuple, audio: bytes | None):
+    """从结果线程唤醒等待的协程"""
+    loop, future = waiter
+    loop.call_soon_threadsafe(_set_result, future, audio)
+
+
+def _set_result(future, audio):
+    if not future.done():
+        future.set_result(audio)
@@ -1,8 +1,77 @@
 import os
+import asyncio
 import logging
-import io
+import struct
+import tempfile
+import threading
 from pathlib import Path
 
+# genie 输出的 PCM 格式：32kHz、16bit、单声道
+GENIE_SAMPLE_RATE = 32000
+
+
+def wav_stream_header(sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """
+    流式输出用的 WAV 头：总长度未知，RIFF 和 data 的长度按惯例填 0xFFFFFFFF，解码器会读到数据末尾
+    """
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", 0xFFFFFFFF,
+    )
+
+
+class InMemoryOutput:
+    """
+    genie.tts 只能把结果写到文件里，这里给它准备一个不落盘的输出路径，每次合成复用同一块内存：
+    1. Linux 上优先用 memfd（纯内存文件，通过 /proc/self/fd/N 作为路径传给 genie）
+    2. 没有 memfd 时用 /dev/shm（tmpfs）下的临时文件
+    3. 都没有时才退回普通临时文件
+    不是线程安全的，调用方需要自己加锁。
+
+    :param use_memory: False 时直接使用普通临时文件（旧的行为）
+    """
+
+    def __init__(self, use_memory: bool = True):
+        self.fd = None
+        self.tmp_dir = None
+        if not use_memory:
+            return
+        if hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd"):
+            try:
+                self.fd = os.memfd_create("genie-tts-output")
+            except OSError:
+                self.fd = None
+        if self.fd is None and os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+            self.tmp_dir = "/dev/shm"
+
+    def write(self, writer) -> bytes:
+        """
+        调用 writer(path) 把音频写到 path，然后返回写入的全部字节
+        """
+        if self.fd is not None:
+            os.ftruncate(self.fd, 0)
+            writer(f"/proc/self/fd/{self.fd}")
+            size = os.fstat(self.fd).st_size
+            return os.pread(self.fd, size, 0)
+
+        with tempfile.NamedTemporaryFile(suffix='.wav', dir=self.tmp_dir, delete=False) as tmp_file:
+            tmp_path = tmp_file.name
+        try:
+            writer(tmp_path)
+            with open(tmp_path, 'rb') as f:
+                return f.read()
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
 
 class Client:
     """
@@ -17,7 +86,8 @@ class Client:
                  language: str = "ja",
                  reference_audio_path: str = "",
                  reference_audio_text: str = "",
-                 auto_load: bool = True):
+                 auto_load: bool = True,
+                 output_mode: str = "memory"):
         """
         初始化 Genie TTS 客户端
         虽然看起来非常长，但是实际上它只干了配置本身的各种字符串和导入Genie-TTS库这几件事。
@@ -29,12 +99,18 @@ class Client:
         :param reference_audio_path: 参考音频路径
         :param reference_audio_text: 参考音频对应的文本
         :param auto_load: 是否自动加载模型
+        :param output_mode: memory 表示合成结果写到内存文件（memfd/tmpfs），file 表示写普通临时文件
         """
         self.character_name = character_name
         self.language = language
         self.reference_audio_path = reference_audio_path
         self.reference_audio_text = reference_audio_text
         self.is_loaded = False
+        self.output = InMemoryOutput(use_memory=(output_mode == "memory"))
+        # genie 内部的 tts_player 是进程级单例，多个线程同时合成会互相干扰，所以这里串行化
+        self._lock = threading.Lock()
+        # 流式合成在事件循环里进行，用 asyncio 的锁串行化（同一配置下只会走其中一条路径）
+        self._stream_lock = asyncio.Lock()
         
         # 获取项目根目录（MAHO 目录）
         # __file__ = backend/core/component/tts/genie_tts_service.py
@@ -138,42 +214,64 @@ class Client:
         try:
             # 如果提供了临时参考音频，则更新参考音频
             if reference_audio_path and reference_audio_text:
-                self._set_reference_audio(reference_audio_path, reference_audio_text)
+                with self._lock:
+                    self._set_reference_audio(reference_audio_path, reference_audio_text)
             
-            # 生成音频到内存
-            audio_buffer = io.BytesIO()
-            
-            # 使用 genie.tts 生成音频
-            # 注意: genie_tts 默认保存到文件，我们需要生成临时文件然后读取
-            import tempfile
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                tmp_path = tmp_file.name
-            
-            try:
-                # 生成音频
+            def write_wav(path):
                 self.genie.tts(
                     character_name=self.character_name,
                     text=text,
                     play=False,  # 不播放
-                    save_path=tmp_path,
+                    save_path=path,
                 )
-                
-                # 读取生成的音频文件
-                with open(tmp_path, 'rb') as f:
-                    audio_data = f.read()
-                
-                logging.info(f"成功为文本生成音频: {text[:50]}...")
-                return audio_data
-                
-            finally:
-                # 清理临时文件
-                if os.path.exists(tmp_path):
-                    os.unlink(tmp_path)
-                    
+
+            # genie_tts 只能保存到文件，这里让它写到内存文件里再读出来，不经过磁盘
+            with self._lock:
+                audio_data = self.output.write(write_wav)
+
+            if not audio_data:
+                logging.error("TTS 没有生成任何音频")
+                return None
+            logging.info(f"成功为文本生成音频: {text[:50]}...")
+            return audio_data
+
         except Exception as e:
             logging.error(f"TTS 生成失败: {e}")
             return None
     
+    async def generate_audio_stream(self, text: str, **kwargs):
+        """
+        流式生成音频：直接使用 genie.tts_async 从模型输出数组转换来的 PCM，不经过文件。
+        开启分句后长句子每合成完一小段就输出一段。
+        先输出一个长度未知的 WAV 头，之后是 PCM 数据，所有分段拼起来就是完整的 WAV。
+
+        :param text: 要合成的文本
+        """
+        if not self.is_loaded:
+            logging.error("模型未加载，无法生成音频。")
+            return
+
+        async with self._stream_lock:
+            yield wav_stream_header(GENIE_SAMPLE_RATE)
+            async for pcm in self.genie.tts_async(
+                    character_name=self.character_name,
+                    text=text,
+                    play=False,
+                    split_sentence=True,
+            ):
+                yield pcm
+        logging.info(f"成功为文本流式生成音频: {text[:50]}...")
+
+    def cache_identity(self) -> dict:
+        """影响音色的参数，TTS 缓存用它区分不同角色/参考音频"""
+        return {
+            "character_name": self.character_name,
+            "onnx_model_dir": self.onnx_model_dir,
+            "language": self.language,
+            "reference_audio_path": self.reference_audio_path,
+            "reference_audio_text": self.reference_audio_text,
+        }
+
     def set_reference(self, audio_path: str, audio_text: str):
         """
         更新参考音频
@@ -185,3 +283,7 @@ class Client:
         self.reference_audio_text = audio_text
         if self.is_loaded:
             self._set_reference_audio(audio_path, audio_text)
+
+    def close(self):
+        """释放内存输出文件"""
+        self.output.close()
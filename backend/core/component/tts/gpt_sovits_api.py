@@ -1,5 +1,5 @@
-import requests
 import logging
+from core.util.http import HttpClient
 
 
 class Client:
@@ -12,7 +12,21 @@ class Client:
                  speed: float = 1.0,
                  top_k: int = 20,
                  top_p: float = 0.7,
-                 temperature: float = 0.7):
+                 temperature: float = 0.7,
+                 max_connections: int = 8,
+                 keepalive_timeout: float = 60,
+                 connect_timeout: float = 5,
+                 read_timeout: float = 60,
+                 retries: int = 2,
+                 retry_backoff: float = 0.2):
+        """
+        :param max_connections: 到 GPT-SoVITS 服务的最大连接数（同时合成的句子数）
+        :param keepalive_timeout: 空闲连接保持时间（秒）
+        :param connect_timeout: 建立连接超时（秒）
+        :param read_timeout: 两次读取之间的超时（秒），整句合成时就是等待合成完成的时间
+        :param retries: 连接失败、超时或服务端返回 5xx 时最多重试几次
+        :param retry_backoff: 第一次重试前的等待时间（秒），之后每次翻倍
+        """
         self.base_url = base_url
         self.refer_wav_path = refer_wav_path
         self.prompt_text = prompt_text
@@ -22,18 +36,81 @@ class Client:
         self.top_k = top_k
         self.top_p = top_p
         self.temperature = temperature
+        self.http = HttpClient(
+            max_connections=max_connections,
+            keepalive_timeout=keepalive_timeout,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries=retries,
+            backoff=retry_backoff,
+        )
+
+    def cache_identity(self) -> dict:
+        """影响音色的参数，TTS 缓存用它区分不同参考音频和合成参数"""
+        return {
+            "base_url": self.base_url,
+            "refer_wav_path": self.refer_wav_path,
+            "prompt_text": self.prompt_text,
+            "prompt_language": self.prompt_language,
+            "default_text_language": self.default_text_language,
+            "speed": self.speed,
+            "top_k": self.top_k,
+            "top_p": self.top_p,
+            "temperature": self.temperature,
+        }
+
+    async def close(self):
+        """关闭长连接，应用退出时调用"""
+        await self.http.close()
 
-    def generate_audio(self, text: str, text_language: str | None = None, **kwargs) -> bytes | None:
+    async def generate_audio(self, text: str, text_language: str | None = None, **kwargs) -> bytes | None:
         """
         调用 GPT-SoVITS API 生成音频
         :param text: 要合成的文本
         :param text_language: 文本语言，默认为初始化时的配置
         :return: 音频二进制数据
         """
+        data = self._build_payload(text, text_language, kwargs)
+
+        try:
+            status, body = await self.http.request("POST", self.base_url, json=data)
+            if status == 200:
+                return body
+            else:
+                logging.error(
+                    f"TTS API 错误: {status} - {body.decode('utf-8', errors='replace')}")
+                return None
+        except Exception as e:
+            logging.error(f"TTS 请求失败: {e!r}")
+            return None
+
+    async def generate_audio_stream(self, text: str, text_language: str | None = None, **kwargs):
+        """
+        流式调用 GPT-SoVITS API，边接收边 yield 音频分段
+        （服务端以流式模式启动时会分块返回，否则整段返回，这里都能处理）
+        :param text: 要合成的文本
+        :param text_language: 文本语言，默认为初始化时的配置
+        """
+        data = self._build_payload(text, text_language, kwargs)
+
+        try:
+            async with self.http.stream("POST", self.base_url, json=data) as response:
+                if response.status != 200:
+                    logging.error(
+                        f"TTS API 错误: {response.status} - {await response.text()}")
+                    return
+                async for chunk in response.content.iter_chunked(16 * 1024):
+                    if chunk:
+                        yield chunk
+        except Exception as e:
+            logging.error(f"TTS 请求失败: {e!r}")
+
+    def _build_payload(self, text: str, text_language: str | None, kwargs: dict) -> dict:
+        """构造 GPT-SoVITS 的请求体"""
         if text_language is None:
             text_language = self.default_text_language
 
-        data = {
+        return {
             "refer_wav_path": self.refer_wav_path,
             "prompt_text": self.prompt_text,
             "prompt_language": self.prompt_language,
@@ -45,15 +122,3 @@ class Client:
             "temperature": kwargs.get("temperature", self.temperature),
             # "sample_steps": 40 # 可选
         }
-
-        try:
-            response = requests.post(self.base_url, json=data)
-            if response.status_code == 200:
-                return response.content
-            else:
-                logging.error(
-                    f"TTS API 错误: {response.status_code} - {response.text}")
-                return None
-        except Exception as e:
-            logging.error(f"TTS 请求失败: {e}")
-            return None
@@ -0,0 +1,68 @@
+import asyncio
+import struct
+import time
+
+SAMPLE_RATE = 32000
+
+
+class Client:
+    """
+    离线压测用的 TTS 桩组件，不需要 GPU 和 TTS 服务。
+    按文本长度生成固定大小的静音 PCM（16bit 单声道 WAV），合成耗时由配置决定，结果完全确定。
+    """
+
+    def __init__(self,
+                 first_chunk_delay: float = 0.15,
+                 seconds_per_char: float = 0.02,
+                 audio_seconds_per_char: float = 0.2,
+                 chunks: int = 4):
+        """
+        :param first_chunk_delay: 开始合成到第一段音频的延迟
+        :param seconds_per_char: 每个字的合成耗时（均摊到各个分段上）
+        :param audio_seconds_per_char: 每个字生成的音频时长，决定音频大小（32kHz 16bit，每秒 64KB）
+        :param chunks: 流式合成时分成几段输出
+        """
+        self.first_chunk_delay = first_chunk_delay
+        self.seconds_per_char = seconds_per_char
+        self.audio_seconds_per_char = audio_seconds_per_char
+        self.chunks = max(1, chunks)
+
+    def cache_identity(self) -> dict:
+        return {"stub": True, "audio_seconds_per_char": self.audio_seconds_per_char}
+
+    def _pcm_size(self, text: str) -> int:
+        samples = int(len(text) * self.audio_seconds_per_char * SAMPLE_RATE)
+        return samples * 2
+
+    @staticmethod
+    def _wav_header(data_size: int) -> bytes:
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1,
+            SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16, b"data", data_size)
+
+    def generate_audio(self, text: str, **kwargs) -> bytes:
+        """同步合成（和真实组件一样会阻塞，由 TTS 服务放到线程池里执行）"""
+        time.sleep(self.first_chunk_delay + len(text) * self.seconds_per_char)
+        size = self._pcm_size(text)
+        return self._wav_header(size) + bytes(size)
+
+    def generate_audio_batch(self, texts: list, **kwargs) -> list:
+        """
+        批量合成：模拟 GPU 上的批量推理，一批只付一次固定延迟，耗时按最长的一句计算
+        """
+        longest = max((len(text) for text in texts), default=0)
+        time.sleep(self.first_chunk_delay + longest * self.seconds_per_char)
+        return [self._wav_header(self._pcm_size(text)) + bytes(self._pcm_size(text)) for text in texts]
+
+    async def generate_audio_stream(self, text: str, **kwargs):
+        """流式合成：先输出 WAV 头，再分 chunks 段输出 PCM"""
+        size = self._pcm_size(text)
+        await asyncio.sleep(self.first_chunk_delay)
+        yield self._wav_header(size)
+        chunk_size = -(-size // self.chunks)
+        interval = len(text) * self.seconds_per_char / self.chunks
+        for offset in range(0, size, chunk_size):
+            if offset:
+                await asyncio.sleep(interval)
+            yield bytes(min(chunk_size, size - offset))
@@ -0,0 +1,185 @@
+import math
+import re
+
+# 中日韩文字大致一个字一个 token，其余文本按 4 个字符一个 token 估算
+_CJK_PATTERN = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+# 每条消息在对话模板里额外占用的 token（角色标记、分隔符等）
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数，不依赖具体模型的分词器"""
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class ContextWindow:
+    """
+    按 token 预算管理的上下文窗口。
+
+    - 系统提示词始终保留在第一条，不计入可裁剪的部分
+    - 每条消息的 token 数只在加入时算一次并缓存，总数增量维护，裁剪不需要重新计算整个窗口
+    - 超过 max_tokens 时从最旧的消息开始丢弃，一直降到 max_tokens * low_watermark 以下，
+      留出余量，之后的几轮只追加不裁剪，窗口前缀保持不变，LLM 服务端的前缀缓存可以命中
+    - 窗口第一条对话消息总是 user，不会留下没有提问的半轮回答
+    - 最新一轮（最后一条提问和它之后的回答）永远保留，只裁更早的消息；最新一轮本身就超过低水位时
+      改为只裁到 max_tokens 以下，尽量多留一些更早的上下文
+    - 可以带一条滚动摘要（见 core.summarizer），放在系统提示词之后；开启 keep_dropped 时
+      被裁掉的消息先放进 pending，等下一次摘要时折叠进去，而不是直接丢失；摘要一直失败时 pending 最多保留
+      max_pending 条，更早的直接丢弃（对话记录里还有）
+
+    参数:
+        system_prompt (str): 系统提示词，为空则没有系统消息
+        max_tokens (int): 发给 LLM 的上下文 token 上限，0 表示不限制
+        low_watermark (float): 裁剪后的目标比例
+        count_tokens: 计算 token 数的函数，默认 estimate_tokens
+        keep_dropped (bool): 是否保留被裁掉的消息等待摘要
+        max_pending (int): pending 最多保留的条数，0 表示不限制
+    """
+
+    def __init__(self, system_prompt: str = "", max_tokens: int = 0, low_watermark: float = 0.75,
+                 count_tokens=estimate_tokens, keep_dropped: bool = False, max_pending: int = 64):
+        self.max_tokens = max_tokens
+        self.low_watermark = low_watermark
+        self.count_tokens = count_tokens
+        self.system = {"role": "system", "content": system_prompt} if system_prompt else None
+        self.system_tokens = self._message_tokens(self.system) if self.system else 0
+        self._messages = []  # 对话消息（不含系统提示词）
+        self._tokens = []    # 每条消息的 token 数，与 _messages 一一对应
+        self.summary = ""   # 较早对话的滚动摘要
+        self.summary_tokens = 0
+        self.keep_dropped = keep_dropped
+        self.max_pending = max_pending
+        self.pending = []   # 已经裁掉、还没折叠进摘要的消息
+        self.total_tokens = self.system_tokens
+        self.version = 0    # 每次改动加一，异步摘要完成时用来确认窗口没有变过
+
+    def _message_tokens(self, message: dict) -> int:
+        return self.count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+    def append(self, role: str, content: str) -> list:
+        """
+        追加一条消息，超出预算时裁剪
+
+        返回:
+            list: 被裁剪掉的消息
+        """
+        self._add({"role": role, "content": content})
+        return self.trim()
+
+    def reset(self, messages: list) -> list:
+        """用一组消息（比如恢复的对话记录）替换窗口里的对话，系统提示词不变，摘要清空"""
+        self._messages = []
+        self._tokens = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.pending = []
+        self.total_tokens = self.system_tokens
+        self.version += 1
+        for message in messages:
+            self._add({"role": message["role"], "content": message["content"]})
+        return self.trim()
+
+    def to_dict(self) -> dict:
+        """窗口里的对话、摘要和待摘要的消息，可以 JSON 序列化，保存到会话存储里（见 core/session_store.py）"""
+        return {"messages": self._messages, "summary": self.summary, "pending": self.pending}
+
+    def load(self, state: dict) -> list:
+        """从 to_dict 的结果恢复窗口，系统提示词用当前配置的，token 数重新计算并按当前预算裁剪"""
+        self._messages = []
+        self._tokens = []
+        self.summary = state.get("summary", "")
+        self.summary_tokens = self._message_tokens(self._summary_message()) if self.summary else 0
+        self.pending = list(state.get("pending", []))[-self.max_pending:]
+        self.total_tokens = self.system_tokens + self.summary_tokens
+        self.version += 1
+        for message in state.get("messages", []):
+            self._add({"role": message["role"], "content": message["content"]})
+        return self.trim()
+
+    def _add(self, message: dict):
+        tokens = self._message_tokens(message)
+        self._messages.append(message)
+        self._tokens.append(tokens)
+        self.total_tokens += tokens
+        self.version += 1
+
+    def trim(self) -> list:
+        """超过 max_tokens 时从最旧的消息开始丢弃，降到低水位为止（不动最新一轮），返回被丢弃的消息"""
+        if not self.max_tokens or self.total_tokens <= self.max_tokens:
+            return []
+
+        # 最新一轮从最后一条提问开始，没有提问时整个窗口都可以裁
+        keep = len(self._messages)
+        for i in range(len(self._messages) - 1, -1, -1):
+            if self._messages[i]["role"] == "user":
+                keep = i
+                break
+        target = self.max_tokens * self.low_watermark
+        if self.total_tokens - sum(self._tokens[:keep]) > target:
+            target = self.max_tokens
+        total = self.total_tokens
+        drop = 0
+        while drop < keep and total > target:
+            total -= self._tokens[drop]
+            drop += 1
+        # 不留下没有提问的回答
+        while drop < keep and self._messages[drop]["role"] != "user":
+            total -= self._tokens[drop]
+            drop += 1
+
+        dropped = self._messages[:drop]
+        del self._messages[:drop]
+        del self._tokens[:drop]
+        self.total_tokens = total
+        if self.keep_dropped:
+            self.pending.extend(dropped)
+            del self.pending[:-self.max_pending]
+        return dropped
+
+    def fold_candidates(self, keep_recent: int) -> tuple[list, int, int]:
+        """
+        需要折叠进摘要的消息：已裁掉的 pending + 窗口里最近 keep_recent 条之前的消息。
+        保留部分仍然从 user 开始
+
+        返回:
+            tuple: (消息列表, 其中来自 pending 的条数, 来自窗口的条数)
+        """
+        cut = max(0, len(self._messages) - keep_recent)
+        while cut < len(self._messages) and self._messages[cut]["role"] != "user":
+            cut += 1
+        if cut == len(self._messages):
+            cut = 0  # 最近的消息里没有提问，这次只折叠 pending
+        return self.pending + self._messages[:cut], len(self.pending), cut
+
+    def apply_summary(self, summary: str, pending_count: int, cut: int) -> list:
+        """
+        用新的摘要替换旧摘要，并移除已经折叠进去的消息（参数来自 fold_candidates）。
+        新摘要比折叠掉的消息还长时可能超出预算，这时照常裁剪
+
+        返回:
+            list: 被裁剪掉的消息
+        """
+        del self.pending[:pending_count]
+        self.total_tokens -= sum(self._tokens[:cut]) + self.summary_tokens
+        del self._messages[:cut]
+        del self._tokens[:cut]
+        self.summary = summary
+        self.summary_tokens = self._message_tokens(self._summary_message())
+        self.total_tokens += self.summary_tokens
+        self.version += 1
+        return self.trim()
+
+    def _summary_message(self) -> dict:
+        return {"role": "system", "content": f"之前对话的摘要：{self.summary}"}
+
+    def messages(self) -> list:
+        """发给 LLM 的消息列表：系统提示词 + 摘要 + 窗口内的对话"""
+        messages = [self.system] if self.system else []
+        if self.summary:
+            messages.append(self._summary_message())
+        return messages + self._messages
+
+    def __len__(self):
+        return len(self._messages)
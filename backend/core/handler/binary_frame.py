@@ -0,0 +1,40 @@
+"""
+WebSocket 二进制音频帧。
+
+默认协议是 JSON 文本消息，音频用 base64 放在 data 字段里。前端在连接后发送
+    {"type": "hello", "binary": true, "token": "..."}
+协商成功（后端回复 {"type": "hello", "binary": true}）之后，音频改为二进制帧收发：
+
+    | type (1 字节) | flags (1 字节) | seq (4 字节, 大端) | 音频原始字节 ... |
+
+- type: 帧类型，目前只有 FRAME_AUDIO
+- flags: 第 0 位为 is_final，表示一段音频（一句话 / 一次录音）的最后一帧
+- seq: 每个方向各自递增的序号，方便对端检查丢帧和乱序
+其余消息（text/start/end/interrupt 等）仍然使用 JSON。
+"""
+import struct
+
+FRAME_AUDIO = 1
+
+FLAG_FINAL = 0x01
+
+HEADER = struct.Struct("!BBI")
+
+
+def pack_frame(frame_type: int, seq: int, payload: bytes, is_final: bool = False) -> bytes:
+    """打包一帧：头部 + 原始字节"""
+    flags = FLAG_FINAL if is_final else 0
+    return HEADER.pack(frame_type, flags, seq & 0xFFFFFFFF) + payload
+
+
+def unpack_frame(data: bytes):
+    """
+    解析一帧
+
+    返回:
+        tuple: (frame_type, seq, is_final, payload)
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"二进制帧长度不足: {len(data)}")
+    frame_type, flags, seq = HEADER.unpack_from(data)
+    return frame_type, seq, bool(flags & FLAG_FINAL), data[HEADER.size:]
@@ -0,0 +1,20 @@
+import pytest
+from core.handler.binary_frame import FRAME_AUDIO, HEADER, pack_frame, unpack_frame
+
+
+def test_round_trip():
+    frame = pack_frame(FRAME_AUDIO, 7, b"\x01\x02\x03", is_final=True)
+    assert len(frame) == HEADER.size + 3
+    assert unpack_frame(frame) == (FRAME_AUDIO, 7, True, b"\x01\x02\x03")
+    assert unpack_frame(pack_frame(FRAME_AUDIO, 8, b"")) == (FRAME_AUDIO, 8, False, b"")
+
+
+def test_header_layout():
+    # type、flags 各 1 字节，seq 4 字节大端，超过 32 位时回绕
+    assert pack_frame(FRAME_AUDIO, 0x01020304, b"", is_final=True) == b"\x01\x01\x01\x02\x03\x04"
+    assert unpack_frame(pack_frame(FRAME_AUDIO, 2 ** 32 + 5, b""))[1] == 5
+
+
+def test_short_frame_rejected():
+    with pytest.raises(ValueError):
+        unpack_frame(b"\x01\x00\x00")
@@ -1,10 +1,15 @@
 from core.auth.login import AuthManager
-from core.chat import handle_chat, process_char_queue, process_sentence_queue
+from core.chat import handle_chat, process_char_queue, process_sentence_queue, cancel_pending_audio, cancel_summary
+from core.session_store import save_session
+from core.handler.binary_frame import FRAME_AUDIO, unpack_frame
+from core.util.metrics import metrics
 from starlette.websockets import WebSocketDisconnect
 import logging
 import asyncio
 import json
+import time
 import base64
+import uuid
 from pathlib import Path
 import sys
 
@@ -16,27 +21,30 @@ class WSHandler():
     """
     负责处理 WebSocket 连接，接收消息并通过 Amadeus 实例进行处理，
     每个websocket连接对应一个Amadeus实例，确保用户隔离。
+    WSHandler 本身是所有连接共享的，不保存任何连接相关的状态（正在运行的聊天任务等都在 Amadeus 上）。
     """
 
-    def __init__(self):
-        self.auth_manager = AuthManager()  # 用于验证 WebSocket 消息中的 token
-        self.current_chat_task = None      # 记录当前正在运行的聊天任务
+    def __init__(self, auth_manager: AuthManager):
+        self.auth_manager = auth_manager   # 用于验证 WebSocket 消息中的 token，与 HTTP 接口共用一个实例
 
-    async def interrupt_chat(self, websocket, Amadeus):
-        """
-        中断当前的聊天逻辑：取消 LLM 任务，清空队列，发送结束信号
-        """
-        # 断开/取消 LLM 任务
-        if self.current_chat_task and not self.current_chat_task.done():
-            self.current_chat_task.cancel()
+    async def cancel_chat(self, Amadeus):
+        """取消这个连接上正在运行的聊天任务（LLM 生成）"""
+        if Amadeus.chat_task and not Amadeus.chat_task.done():
+            Amadeus.chat_task.cancel()
             try:
-                await self.current_chat_task
+                await Amadeus.chat_task
             except asyncio.CancelledError:
                 logging.info("LLM 生成任务已成功取消")
             except Exception as e:
                 logging.error(f"取消任务时出错: {e}")
-            finally:
-                self.current_chat_task = None
+        Amadeus.chat_task = None
+
+    async def interrupt_chat(self, websocket, Amadeus):
+        """
+        中断当前的聊天逻辑：取消 LLM 任务，清空队列，发送结束信号
+        """
+        # 断开/取消 LLM 任务
+        await self.cancel_chat(Amadeus)
 
         # 清空两个队列
         # 清空消息队列 (字符流)
@@ -55,10 +63,163 @@ class WSHandler():
             except asyncio.QueueEmpty:
                 break
 
+        # 丢掉断句缓冲区里没说完的半句，下一轮重新按第一段处理
+        Amadeus.segmenter.reset()
+
+        # 取消流水线中已经开始翻译/合成但还没发送的句子
+        cancel_pending_audio(Amadeus)
+
         # 发送结束标签
         await websocket.send_text(json.dumps({"type": "end"}))
         logging.info("已中断当前对话并清空队列")
 
+    def authorize(self, Amadeus, token) -> bool:
+        """
+        验证消息中的 token，验证结果绑定到会话（Amadeus.user）上：
+        同一连接里 token 不变且未超过缓存时间时直接通过，不再重复解析和查库
+        """
+        if not token:
+            return False
+        if (Amadeus.user.get("token") == token
+                and Amadeus.user.get("verified_until", 0) > time.time()
+                and not self.auth_manager.is_revoked(Amadeus.user)):
+            return True
+        user_info = self.auth_manager.verify_token(token)
+        if not user_info:
+            Amadeus.user = {}
+            return False
+        Amadeus.user = {
+            "username": user_info.get("username"),
+            "token": token,
+            "jti": user_info.get("jti"),
+            "iat": user_info.get("iat", 0),
+            # 不超过 token 本身的过期时间
+            "verified_until": min(time.time() + self.auth_manager.token_cache_ttl, user_info.get("exp", 0)),
+        }
+        return True
+
+    async def open_session(self, Amadeus, session_id: str | None = None) -> bool:
+        """
+        通过验证后绑定会话：
+        - 带了 session_id，且会话存储里有这个用户的这个会话：接上它（可能来自之前的连接或别的 worker）
+        - 否则这个用户第一次在本连接上通过验证时新建一个会话，上下文从对话记录里恢复
+
+        返回:
+            bool: 是否接上了已有的会话
+        """
+        username = Amadeus.user.get("username")
+        if Amadeus.history_user == username and (not session_id or session_id == Amadeus.session_id):
+            return bool(session_id)
+        if session_id and await self.resume_session(Amadeus, session_id):
+            return True
+        if Amadeus.history_user != username:
+            Amadeus.session_id = uuid.uuid4().hex
+            await self.restore_history(Amadeus)
+            await save_session(Amadeus)
+        return False
+
+    async def resume_session(self, Amadeus, session_id: str) -> bool:
+        """从会话存储里恢复上下文窗口等状态，会话不存在、已过期或不属于当前用户时返回 False"""
+        username = Amadeus.user.get("username")
+        try:
+            state = await Amadeus.sessions.load(session_id)
+        except Exception as e:
+            logging.error(f"读取会话状态失败: {e}")
+            return False
+        if not state or state.get("username") != username:
+            return False
+        Amadeus.session_id = session_id
+        Amadeus.history_user = username
+        Amadeus.context_window.load(state.get("context", {}))
+        Amadeus.context_window_index = state.get("context_window_index", 0)
+        # 存储里还有进行中的一轮，说明当时处理它的连接（或 worker）没来得及正常结束，算作没有完成
+        turn_id = state.get("turn_id")
+        Amadeus.last_turn = {"id": turn_id, "completed": False} if turn_id else state.get("last_turn")
+        await save_session(Amadeus)
+        logging.info(f"用户 {username} 已接上会话 {session_id}，上下文 {len(Amadeus.context_window)} 条消息")
+        return True
+
+    async def restore_history(self, Amadeus):
+        """
+        用户第一次通过验证时，从对话记录里恢复最近的几条消息到上下文窗口。
+        只读取固定条数，与历史总长度无关
+        """
+        username = Amadeus.user.get("username")
+        if not username or Amadeus.history_user == username:
+            return
+        Amadeus.history_user = username
+        if Amadeus.history is None:
+            return
+        try:
+            messages = await Amadeus.history.recent(username)
+        except Exception as e:
+            logging.error(f"恢复对话记录失败: {e}")
+            return
+        # 系统提示词保留，对话部分替换为该用户的对话记录（超出 token 预算的部分会被裁掉）
+        Amadeus.context_window.reset(messages)
+        logging.info(f"已为用户 {username} 恢复 {len(messages)} 条对话记录")
+
+    async def send_history(self, websocket, Amadeus, msg):
+        """
+        返回一页对话记录：
+        - 带 after：返回 id 大于 after 的消息（增量同步）
+        - 带 before：返回 id 小于 before 的消息（向前翻页）
+        - 都不带：从 context_window_index 往后增量返回；本连接还没同步过时返回最新的一页
+        """
+        if Amadeus.history is None:
+            await websocket.send_text(json.dumps({"type": "error", "msg": "未启用对话记录"}))
+            return
+        # 与 /api/history 一样只接受整数，前端传错了回复错误消息，不能让异常断开连接
+        try:
+            after, before, limit = (_optional_int(msg.get(key)) for key in ("after", "before", "limit"))
+        except (TypeError, ValueError):
+            await websocket.send_text(json.dumps({"type": "error", "msg": "after、before、limit 必须是整数"}))
+            return
+        if after is None and before is None and Amadeus.context_window_index:
+            after = Amadeus.context_window_index
+        messages, has_more = await Amadeus.history.page(
+            Amadeus.user["username"], after=after, before=before, limit=50 if limit is None else limit)
+        if messages and before is None:
+            Amadeus.context_window_index = max(Amadeus.context_window_index, messages[-1]["id"])
+        await websocket.send_text(json.dumps(
+            {"type": "history", "data": messages, "has_more": has_more}, ensure_ascii=False))
+
+    async def finish_audio(self, Amadeus):
+        """语音输入结束，记下时间用来统计 ASR 出最终结果的耗时"""
+        Amadeus.asr_finished_at = time.perf_counter()
+        await Amadeus.asr.finish_audio()
+
+    async def handle_binary_frame(self, websocket, Amadeus, data) -> bool:
+        """
+        处理前端发来的二进制音频帧，需要先通过 hello 消息协商（协商时已验证 token）。
+        帧里不带 token，每帧用 hello 时绑定的 token 重新走一次 authorize（命中缓存时不重新解析），
+        token 过期或被注销后返回 False，由调用方关闭连接
+        """
+        if not Amadeus.binary_frames:
+            await websocket.send_text(json.dumps({"type": "error", "msg": "未协商二进制帧，请先发送 hello"}))
+            return True
+        if not self.authorize(Amadeus, Amadeus.user.get("token")):
+            Amadeus.binary_frames = False
+            await websocket.send_text(json.dumps({"type": "error", "msg": "未授权，请先登录"}))
+            return False
+        try:
+            frame_type, seq, is_final, payload = unpack_frame(data)
+        except ValueError as e:
+            logging.error(f"二进制帧解析失败: {e}")
+            return True
+        if frame_type != FRAME_AUDIO:
+            logging.warning(f"未知的二进制帧类型: {frame_type}")
+            return True
+
+        if payload:
+            try:
+                await Amadeus.asr.send_audio(payload)
+            except Exception as e:
+                logging.error(f"音频处理失败: {e}")
+        if is_final:
+            await self.finish_audio(Amadeus)
+        return True
+
     async def handle_ws(self, websocket, Amadeus):
         """
         这里主要是接收数据，发送消息是通过队列异步完成的，就是下面的两个任务
@@ -77,37 +238,74 @@ class WSHandler():
         # 定义 ASR 结果回调：直接触发聊天
         async def on_asr_result(text):
             logging.info(f"ASR 识别结果回调: {text}")
-            self.current_chat_task = asyncio.create_task(
-                handle_chat(websocket, Amadeus, text))
+            started_at = Amadeus.asr_finished_at
+            Amadeus.asr_finished_at = None
+            if started_at is not None:
+                metrics.observe("asr_finalize", time.perf_counter() - started_at, provider=Amadeus.asr.select)
+            Amadeus.chat_task = asyncio.create_task(
+                handle_chat(websocket, Amadeus, text, started_at))
 
         # 初始化 ASR 连接
         await Amadeus.asr.start(on_asr_result)
 
         try:
             while True:
-                data = await websocket.receive_text()
-                msg = json.loads(data)
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes") is not None:
+                    # 二进制帧只用于音频，token 失效时关闭连接（1008: 违反策略）
+                    if not await self.handle_binary_frame(websocket, Amadeus, message["bytes"]):
+                        await websocket.close(code=1008)
+                        break
+                    continue
+                msg = json.loads(message["text"])
 
-                if msg.get("type") == "chat":
+                if msg.get("type") == "hello":
+                    # 协商二进制音频帧。协商时验证一次 token，之后的二进制音频帧不再逐帧携带 token；
+                    # 验证通过时绑定会话：带了之前的 session_id 就接上原来的会话（可以是别的 worker 上的），
+                    # 否则新建会话并从对话记录恢复上下文，重连后上下文不丢
                     token = msg.get("token")
-                    if not token or not self.auth_manager.verify_token(token):
+                    resumed = False
+                    if self.authorize(Amadeus, token):
+                        resumed = await self.open_session(Amadeus, msg.get("session_id"))
+                        Amadeus.binary_frames = bool(msg.get("binary"))
+                    await websocket.send_text(json.dumps({
+                        "type": "hello",
+                        "binary": Amadeus.binary_frames,
+                        "session_id": Amadeus.session_id,
+                        "resumed": resumed,
+                        "last_turn": Amadeus.last_turn,
+                    }))
+
+                elif msg.get("type") == "chat":
+                    if not self.authorize(Amadeus, msg.get("token")):
                         await websocket.send_text(json.dumps({"type": "error", "msg": "未授权，请先登录"}))
                         continue
+                    await self.open_session(Amadeus)
                     
                     # 创建新的聊天任务，不阻塞主循环以接收后续消息（如打断信号）
-                    self.current_chat_task = asyncio.create_task(
+                    Amadeus.chat_task = asyncio.create_task(
                         handle_chat(websocket, Amadeus, msg.get("data")))
                 
+                elif msg.get("type") == "history":
+                    # 拉取对话记录（增量或分页）
+                    if not self.authorize(Amadeus, msg.get("token")):
+                        await websocket.send_text(json.dumps({"type": "error", "msg": "未授权，请先登录"}))
+                        continue
+                    await self.open_session(Amadeus)
+                    await self.send_history(websocket, Amadeus, msg)
+
                 elif msg.get("type") == "interrupt":
                     # 显式接收到打断信号
                     await self.interrupt_chat(websocket, Amadeus)
                 
                 elif msg.get("type") == "audio":
                     # 接收音频数据
-                    token = msg.get("token")
-                    if not token or not self.auth_manager.verify_token(token):
+                    if not self.authorize(Amadeus, msg.get("token")):
                         await websocket.send_text(json.dumps({"type": "error", "msg": "未授权，请先登录"}))
                         continue
+                    await self.open_session(Amadeus)
                     
                     audio_data = msg.get("data")
                     is_final = msg.get("is_final", False)
@@ -121,11 +319,16 @@ class WSHandler():
                             logging.error(f"音频处理失败: {e}")
 
                     if is_final:
-                        await Amadeus.asr.finish_audio()
+                        await self.finish_audio(Amadeus)
         except WebSocketDisconnect:
             logging.info("WebSocket 已断开")
         finally:
-            # 取消处理任务
+            # 取消处理任务。连接断开时进行中的这一轮也停掉（结束状态会写入会话存储），
+            # 前端重连后（可能连到别的 worker）通过 hello 里的 last_turn 知道它没有完成。
+            # 停掉这一轮时 handle_chat 会安排空闲摘要，所以摘要要在它之后取消，
+            # 否则断开后摘要还会运行，把旧的上下文写回会话存储，覆盖别的 worker 接上后的状态
+            await self.cancel_chat(Amadeus)
+            cancel_summary(Amadeus)
             char_task.cancel()
             sentence_task.cancel()
             try:
@@ -133,3 +336,12 @@ class WSHandler():
                 await sentence_task
             except asyncio.CancelledError:
                 pass
+
+
+def _optional_int(value) -> int | None:
+    """None 原样返回，整数和整数字符串转成 int，其余（包括 bool、小数）抛出 ValueError"""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"不是整数: {value!r}")
+    return int(value)
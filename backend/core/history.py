@@ -0,0 +1,95 @@
+import logging
+from core.util.storage import get_async_database
+
+MAX_ID = 2 ** 63 - 1  # SQLite INTEGER 的最大值，用作“比所有 id 都大”的上界
+
+
+class HistoryStore:
+    """
+    按用户持久化的对话记录，存放在 SQLite 中，所有会话共享一个实例。
+
+    - 只追加：每条消息一行，id 自增，写入就是一次 INSERT，不会重写已有记录
+    - 增量/分页读取：按 id 向后取（after，断线重连后只取没收到的部分）或向前取（before，往上翻页）
+    - 恢复会话只取最近 restore_messages 条，走 (username, id) 索引，耗时与历史总长度无关
+
+    参数:
+        db_path (str): 数据库文件路径
+        restore_messages (int): 恢复会话时加载进上下文窗口的最近消息条数
+        max_page_size (int): 单次读取最多返回的消息条数
+    """
+
+    def __init__(self,
+                 db_path: str = "data/db/history.db",
+                 restore_messages: int = 40,
+                 max_page_size: int = 200):
+        self.restore_messages = restore_messages
+        self.max_page_size = max_page_size
+        self.db = get_async_database(db_path)
+        self.db.database.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.db.database.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_username_id ON messages (username, id)")
+        logging.info(f"对话记录数据库已加载: {db_path}")
+
+    async def append(self, username: str, role: str, content: str) -> int:
+        """追加一条消息，返回消息 id"""
+        cursor = await self.db.execute(
+            "INSERT INTO messages (username, role, content) VALUES (?, ?, ?)",
+            (username, role, content)
+        )
+        return cursor.lastrowid
+
+    async def recent(self, username: str, limit: int | None = None) -> list:
+        """最近的 limit 条消息（按时间正序），用于恢复会话的上下文窗口"""
+        limit = self.restore_messages if limit is None else limit
+        rows = await self.db.fetchall(
+            "SELECT id, role, content, created_at FROM messages "
+            "WHERE username = ? ORDER BY id DESC LIMIT ?",
+            (username, limit)
+        )
+        return [self._to_message(row) for row in reversed(rows)]
+
+    async def page(self, username: str, after: int | None = None, before: int | None = None,
+                   limit: int = 50) -> tuple[list, bool]:
+        """
+        分页读取消息，结果按时间正序
+
+        参数:
+            after: 只取 id 大于它的消息（从旧到新，增量同步用）
+            before: 只取 id 小于它的消息（从新到旧翻页用），与 after 同时给出时以 after 为准；
+                两者都不给时返回最新的一页
+            limit: 本页条数，不超过 max_page_size
+
+        返回:
+            tuple: (消息列表, 是否还有更多)
+        """
+        limit = max(1, min(int(limit), self.max_page_size))
+        if after is not None:
+            rows = await self.db.fetchall(
+                "SELECT id, role, content, created_at FROM messages "
+                "WHERE username = ? AND id > ? ORDER BY id ASC LIMIT ?",
+                (username, int(after), limit + 1)
+            )
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = await self.db.fetchall(
+                "SELECT id, role, content, created_at FROM messages "
+                "WHERE username = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (username, MAX_ID if before is None else int(before), limit + 1)
+            )
+            has_more = len(rows) > limit
+            rows = list(reversed(rows[:limit]))
+        return [self._to_message(row) for row in rows], has_more
+
+    @staticmethod
+    def _to_message(row) -> dict:
+        message_id, role, content, created_at = row
+        return {"id": message_id, "role": role, "content": content, "created_at": created_at}
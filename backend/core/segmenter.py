@@ -0,0 +1,104 @@
+import time
+
+# 句末标点：遇到就切分（内容太短的除外）
+SENTENCE_ENDINGS = set("。！？.!?\n")
+# 子句边界：内容达到 clause_min_chars 后遇到就提前切分
+CLAUSE_BOUNDARIES = set("，、,;；：:")
+
+
+class SegmentPolicy:
+    """
+    一种切分策略
+
+    参数:
+        clause_min_chars (int): 内容达到这个长度后，遇到子句边界（逗号等）就切分，0 表示只在句末切分
+        max_chars (int): 单段最大长度，超过时在最后一个子句边界处切开（没有则直接切），0 表示不限制
+    """
+
+    def __init__(self, clause_min_chars: int = 0, max_chars: int = 0):
+        self.clause_min_chars = clause_min_chars
+        self.max_chars = max_chars
+
+
+class Segmenter:
+    """
+    把 LLM 的字符流切成送给 TTS 的文本段。
+
+    - 每轮的第一段用 first 策略：达到较短的长度后在逗号处就切出去，尽早开始合成第一段音频
+    - 之后用 rest 策略：尽量按整句切分，段落长一些，语调更连贯
+    - 内容（不算标点）短于 min_chars 的句子不单独成段，并入下一段，避免“嗯。”这类碎片
+    - 一轮结束时调用 flush 取出剩下的内容，并回到 first 策略
+
+    参数:
+        first (dict): 每轮第一段的策略，见 SegmentPolicy
+        rest (dict): 之后各段的策略
+        min_chars (int): 单独成段的最小内容长度
+    """
+
+    def __init__(self, first: dict | None = None, rest: dict | None = None, min_chars: int = 4):
+        self.first_policy = SegmentPolicy(**(first or {"clause_min_chars": 8, "max_chars": 40}))
+        self.rest_policy = SegmentPolicy(**(rest or {"clause_min_chars": 0, "max_chars": 80}))
+        self.min_chars = min_chars
+        self.reset()
+
+    def reset(self):
+        """清空缓冲区，下一段按每轮第一段处理"""
+        self.buffer = ""
+        self.content_chars = 0   # 缓冲区中不算标点和空白的字数
+        self.started_at = None   # 缓冲区第一个字到达的时间
+        self.first = True
+
+    @property
+    def policy(self) -> SegmentPolicy:
+        return self.first_policy if self.first else self.rest_policy
+
+    def feed(self, text: str) -> list:
+        """
+        输入一段字符流，返回切好的段落
+
+        返回:
+            list: [(段落文本, 该段第一个字到达的时间), ...]
+        """
+        segments = []
+        for char in text:
+            if not self.buffer:
+                self.started_at = time.perf_counter()
+            self.buffer += char
+            if char.isalnum():
+                self.content_chars += 1
+
+            policy = self.policy
+            if char in SENTENCE_ENDINGS:
+                if self.content_chars >= self.min_chars:
+                    self._emit(len(self.buffer), segments)
+            elif char in CLAUSE_BOUNDARIES:
+                if policy.clause_min_chars and self.content_chars >= policy.clause_min_chars:
+                    self._emit(len(self.buffer), segments)
+            elif policy.max_chars and self.content_chars >= policy.max_chars:
+                self._emit(self._cut_position(), segments)
+        return segments
+
+    def flush(self) -> list:
+        """一轮结束：剩下的内容（不管多短）作为最后一段，并回到 first 策略"""
+        segments = []
+        if self.content_chars:
+            self._emit(len(self.buffer), segments)
+        self.reset()
+        return segments
+
+    def _cut_position(self) -> int:
+        """超长时的切分位置：最后一个子句边界之后，没有则整段切出"""
+        for i in range(len(self.buffer) - 1, 0, -1):
+            if self.buffer[i] in CLAUSE_BOUNDARIES:
+                return i + 1
+        return len(self.buffer)
+
+    def _emit(self, position: int, segments: list):
+        segment = self.buffer[:position].strip()
+        rest = self.buffer[position:]
+        if segment:
+            segments.append((segment, self.started_at))
+            self.first = False
+        self.buffer = rest
+        self.content_chars = sum(1 for c in rest if c.isalnum())
+        self.started_at = time.perf_counter() if rest else None
@@ -0,0 +1,185 @@
+import json
+import logging
+import threading
+import time
+from core.util.storage import get_async_database
+
+
+class MemorySessionStore:
+    """
+    会话状态存储（默认实现）：保存在当前进程的内存里。
+    只适合单个 uvicorn worker，多个 worker 之间不共享，重连到别的 worker 时会话接不上。
+
+    会话状态是一个可以 JSON 序列化的 dict，内容见 session_state。
+
+    参数:
+        ttl (float): 会话多久没有更新就过期（秒）
+    """
+
+    shared = False  # 多个进程能否看到同一份会话
+
+    def __init__(self, ttl: float = 7 * 24 * 3600):
+        self.ttl = ttl
+        self._sessions = {}  # session_id -> (状态 JSON, 更新时间)
+        self._lock = threading.Lock()
+        self._cleaned_at = 0
+
+    async def load(self, session_id: str) -> dict | None:
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            if item[1] + self.ttl < time.time():
+                del self._sessions[session_id]
+                return None
+            # 存 JSON 而不是 dict 本身，和 SQLite 实现一样，读出来的状态不会和会话里的对象共享引用
+            return json.loads(item[0])
+
+    async def save(self, session_id: str, state: dict):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (json.dumps(state, ensure_ascii=False), now)
+            # 过期清理不需要每次都做，一分钟最多一次
+            if now - self._cleaned_at > 60:
+                self._cleaned_at = now
+                for expired in [k for k, (_, updated_at) in self._sessions.items() if updated_at + self.ttl < now]:
+                    del self._sessions[expired]
+
+    async def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """
+    会话状态存储：保存在 SQLite 中，同一台机器上的多个 uvicorn worker 共用一个数据库文件，
+    断线后重连到任何一个 worker 都能接上原来的会话。
+
+    同时保存已注销 token 的记录和按用户的失效记录（AuthManager 的 revocation_store），
+    在一个 worker 上登出后，其他 worker 定期同步过去，也不再接受这个 token。
+
+    参数:
+        db_path (str): 数据库文件路径
+        ttl (float): 会话多久没有更新就过期（秒），过期的会话在写入时顺便清理
+    """
+
+    shared = True
+
+    def __init__(self, db_path: str = "data/db/sessions.db", ttl: float = 7 * 24 * 3600):
+        self.ttl = ttl
+        self.db = get_async_database(db_path)
+        self.db.database.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.db.database.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+        self.db.database.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                jti TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self.db.database.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_users (
+                username TEXT PRIMARY KEY,
+                not_before REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._cleaned_at = 0
+        logging.info(f"会话数据库已加载: {db_path}")
+
+    async def load(self, session_id: str) -> dict | None:
+        row = await self.db.fetchone(
+            "SELECT state FROM sessions WHERE session_id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl)
+        )
+        return json.loads(row[0]) if row else None
+
+    async def save(self, session_id: str, state: dict):
+        now = time.time()
+        await self.db.execute(
+            "INSERT INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at",
+            (session_id, json.dumps(state, ensure_ascii=False), now)
+        )
+        # 过期清理不需要每次都做，一分钟最多一次
+        if now - self._cleaned_at > 60:
+            self._cleaned_at = now
+            await self.db.execute("DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl,))
+            await self.db.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+            await self.db.execute("DELETE FROM revoked_users WHERE expires_at <= ?", (now,))
+
+    async def delete(self, session_id: str):
+        await self.db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    async def revoke(self, jti: str, expires_at: float):
+        """记录已注销的 token，保留到 token 本身过期"""
+        await self.db.execute(
+            "INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+
+    async def revoked_tokens(self) -> dict:
+        """所有还没过期的注销记录：jti -> 过期时间"""
+        rows = await self.db.fetchall(
+            "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > ?", (time.time(),))
+        return dict(rows)
+
+    async def revoke_user(self, username: str, not_before: float, expires_at: float):
+        """记录某个用户在 not_before 之前签发的 token 全部失效，保留到 expires_at"""
+        await self.db.execute(
+            "INSERT INTO revoked_users (username, not_before, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(username) DO UPDATE SET not_before = max(not_before, excluded.not_before), "
+            "expires_at = max(expires_at, excluded.expires_at)",
+            (username, not_before, expires_at))
+
+    async def revoked_users(self) -> dict:
+        """所有还没过期的用户失效记录：用户名 -> not_before"""
+        rows = await self.db.fetchall(
+            "SELECT username, not_before FROM revoked_users WHERE expires_at > ?", (time.time(),))
+        return dict(rows)
+
+
+def session_state(Amadeus) -> dict:
+    """需要跨连接、跨 worker 保留的会话状态"""
+    return {
+        "username": Amadeus.user.get("username"),
+        "context": Amadeus.context_window.to_dict(),
+        "context_window_index": Amadeus.context_window_index,
+        "turn_id": Amadeus.turn_id,
+        "last_turn": Amadeus.last_turn,
+    }
+
+
+async def save_session(Amadeus):
+    """把会话状态写入会话存储，还没有会话 id（没有通过验证）时不保存"""
+    if not Amadeus.session_id or not Amadeus.user.get("username"):
+        return
+    try:
+        await Amadeus.sessions.save(Amadeus.session_id, session_state(Amadeus))
+    except Exception as e:
+        logging.error(f"保存会话状态失败: {e}")
+
+
+SESSION_STORES = {
+    "memory": MemorySessionStore,
+    "sqlite": SQLiteSessionStore,
+}
+
+
+def create_session_store(config: dict):
+    """
+    按配置创建会话存储：select 选择实现，对应名字的小节是它的参数，ttl 对所有实现通用
+    """
+    select = config.get("select", "memory")
+    store_class = SESSION_STORES.get(select)
+    if store_class is None:
+        raise ValueError(f"不支持的会话存储: {select}，可选: {', '.join(SESSION_STORES)}")
+    options = dict(config.get(select, {}))
+    if "ttl" in config:
+        options.setdefault("ttl", config["ttl"])
+    logging.info(f"会话存储: {select}")
+    return store_class(**options)
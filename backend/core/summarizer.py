@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from core.component.llm.ollama_api import Client as OllamaClient
+from core.session_store import save_session
+
+
+class Summarizer:
+    """
+    对话摘要器：会话空闲时用一个单独配置的小模型，把较早的对话折叠进一条滚动摘要，
+    主模型的上下文始终只有 系统提示词 + 摘要 + 最近几轮，prefill 耗时不随会话变长而增长。
+    所有会话共享一个实例（见 ComponentRegistry）。
+
+    参数:
+        model (str): 摘要用的 Ollama 模型，建议用小参数量模型
+        base_url (str): Ollama 服务地址，默认使用独立端口，和主模型互不抢占
+        idle_seconds (float): 会话空闲多久后开始摘要
+        keep_recent (int): 上下文窗口里保留多少条最近的原文消息
+        min_messages (int): 至少攒够多少条旧消息才折叠一次，避免频繁调用
+        max_chars (int): 摘要的最大字数
+    """
+
+    def __init__(self,
+                 model: str = "qwen2.5:0.5b",
+                 base_url: str = "http://localhost:11435",
+                 idle_seconds: float = 10,
+                 keep_recent: int = 8,
+                 min_messages: int = 6,
+                 max_chars: int = 300):
+        self.ollama_client = OllamaClient(model=model, base_url=base_url)
+        self.idle_seconds = idle_seconds
+        self.keep_recent = keep_recent
+        self.min_messages = min_messages
+        self.max_chars = max_chars
+
+    async def summarize(self, summary: str, messages: list) -> str:
+        """把已有摘要和一批旧消息合并成新的摘要"""
+        role_names = {"user": "用户", "assistant": "助手"}
+        dialogue = "\n".join(f"{role_names.get(m['role'], m['role'])}：{m['content']}" for m in messages)
+        prompt = f"""请把下面的对话合并进已有摘要，写成一段新的摘要。
+保留人物、事实、约定和用户的偏好，省略寒暄，不超过{self.max_chars}字。
+
+已有摘要：
+{summary or "（无）"}
+
+对话：
+{dialogue}
+
+直接输出新的摘要，不要添加任何解释或额外内容。"""
+
+        response = ""
+        async for token in self.ollama_client.generate(prompt, max_tokens=self.max_chars * 2, temperature=0.3):
+            response += token
+        return response.strip()
+
+    async def close(self):
+        """关闭内部 Ollama 客户端的连接池"""
+        await self.ollama_client.close()
+
+
+async def summarize_when_idle(Amadeus):
+    """
+    等会话空闲 idle_seconds 之后，把上下文窗口里较早的消息折叠进摘要。
+    新的对话开始时这个任务会被取消（见 core.chat）；万一摘要期间窗口还是被改动了，这次结果直接丢弃
+    """
+    summarizer = Amadeus.summarizer
+    await asyncio.sleep(summarizer.idle_seconds)
+
+    context_window = Amadeus.context_window
+    version = context_window.version
+    messages, pending_count, cut = context_window.fold_candidates(summarizer.keep_recent)
+    if len(messages) < summarizer.min_messages:
+        return
+    try:
+        summary = await summarizer.summarize(context_window.summary, messages)
+    except Exception as e:
+        logging.error(f"对话摘要失败: {e}")
+        return
+    if not summary or context_window.version != version:
+        return
+    context_window.apply_summary(summary, pending_count, cut)
+    logging.info(f"已将 {len(messages)} 条旧消息折叠进摘要，当前上下文约 {context_window.total_tokens} tokens")
+    await save_session(Amadeus)
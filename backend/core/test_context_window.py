@@ -0,0 +1,60 @@
+from core.context_window import ContextWindow
+
+
+def count_chars(text: str) -> int:
+    return len(text)
+
+
+def make_window(**kwargs) -> ContextWindow:
+    # 每条消息 = 字数 + 4（MESSAGE_OVERHEAD），方便算预算
+    kwargs.setdefault("count_tokens", count_chars)
+    return ContextWindow(**kwargs)
+
+
+def test_trim_drops_oldest_to_low_watermark():
+    window = make_window(max_tokens=100, low_watermark=0.5)
+    for i in range(4):
+        window.append("user", "q" * 16)
+        window.append("assistant", "a" * 16)
+    # 第 6 条超出 100 时裁到 50 以下（只剩最近两条），之后两条只追加不裁剪
+    assert len(window) == 4 and window.total_tokens == 80
+    assert window.messages()[0]["role"] == "user"
+    assert window.total_tokens == sum(len(m["content"]) + 4 for m in window.messages())
+
+
+def test_trim_keeps_latest_turn():
+    window = make_window(max_tokens=100, low_watermark=0.5)
+    window.append("user", "q" * 16)
+    window.append("assistant", "a" * 16)
+    dropped = window.append("user", "x" * 80)
+    # 最新一轮本身超过低水位：只裁到 max_tokens 以下，最新的提问一定保留
+    assert [m["content"] for m in dropped] == ["q" * 16, "a" * 16]
+    assert window.messages()[-1]["content"] == "x" * 80
+    # 最新一轮超过 max_tokens 也不裁
+    assert window.append("assistant", "y" * 80) == []
+    assert len(window) == 2
+
+
+def test_apply_summary_trims_over_budget():
+    window = make_window(max_tokens=200, low_watermark=0.5, keep_dropped=True)
+    for i in range(3):
+        window.append("user", f"q{i}" * 8)
+        window.append("assistant", f"a{i}" * 8)
+    messages, pending_count, cut = window.fold_candidates(keep_recent=4)
+    assert cut == 2
+    # 摘要比折叠掉的消息还长，应用后超出预算，要再裁一次
+    dropped = window.apply_summary("s" * 120, pending_count, cut)
+    assert [m["content"] for m in dropped] == ["q1" * 8, "a1" * 8]
+    assert window.total_tokens <= window.max_tokens
+    assert window.pending == dropped
+
+
+def test_pending_is_capped():
+    window = make_window(max_tokens=30, low_watermark=0.5, keep_dropped=True, max_pending=3)
+    for i in range(10):
+        window.append("user", f"q{i}" * 4)
+        window.append("assistant", f"a{i}" * 4)
+    assert len(window.pending) == 3
+    assert window.pending[-1]["content"] == "a8" * 4
+    window.load(window.to_dict() | {"pending": [{"role": "user", "content": "x"}] * 10})
+    assert len(window.pending) == 3
@@ -0,0 +1,20 @@
+import asyncio
+from core.history import HistoryStore
+
+
+def test_page_clamps_limit_and_pages_both_ways(tmp_path):
+    async def main():
+        store = HistoryStore(str(tmp_path / "history.db"), max_page_size=3)
+        ids = [await store.append("maho", "user", f"m{i}") for i in range(5)]
+        await store.append("okabe", "user", "other")
+
+        latest, more = await store.page("maho", limit=100)       # 超过 max_page_size
+        assert [m["content"] for m in latest] == ["m2", "m3", "m4"] and more
+        older, more = await store.page("maho", before=latest[0]["id"], limit=0)   # 至少 1 条
+        assert [m["content"] for m in older] == ["m1"] and more
+        newer, more = await store.page("maho", after=ids[2], limit=-5)
+        assert [m["content"] for m in newer] == ["m3"] and more
+        rest, more = await store.page("maho", after=ids[2], limit=2)
+        assert [m["content"] for m in rest] == ["m3", "m4"] and not more
+
+    asyncio.run(main())
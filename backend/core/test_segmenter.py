@@ -0,0 +1,34 @@
+from core.segmenter import Segmenter
+
+
+def texts(segments):
+    return [text for text, _ in segments]
+
+
+def test_first_segment_cuts_at_clause():
+    segmenter = Segmenter()
+    # 第一段达到 8 个字后遇到逗号就切
+    assert texts(segmenter.feed("今天天气真的很不错，")) == ["今天天气真的很不错，"]
+    # 之后按整句切，逗号不再切分
+    assert texts(segmenter.feed("我们一起出去走走吧，顺便买点东西。")) == ["我们一起出去走走吧，顺便买点东西。"]
+
+
+def test_short_sentence_merged_into_next():
+    segmenter = Segmenter()
+    assert segmenter.feed("嗯。") == []
+    assert texts(segmenter.feed("我知道了。")) == ["嗯。我知道了。"]
+
+
+def test_max_chars_cuts_at_last_clause():
+    segmenter = Segmenter(first={"clause_min_chars": 0, "max_chars": 10})
+    assert texts(segmenter.feed("一二三，四五六七八九十")) == ["一二三，"]
+    assert segmenter.buffer == "四五六七八九十"
+
+
+def test_flush_returns_rest_and_resets_policy():
+    segmenter = Segmenter()
+    segmenter.feed("今天天气真的很不错，还有半句")
+    assert not segmenter.first
+    assert texts(segmenter.flush()) == ["还有半句"]
+    assert segmenter.first and segmenter.buffer == ""
+    assert segmenter.flush() == []
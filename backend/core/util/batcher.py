@@ -0,0 +1,85 @@
+import asyncio
+import json
+import logging
+import time
+from core.util.metrics import metrics
+
+
+class _Batch:
+    def __init__(self, kwargs: dict):
+        self.kwargs = kwargs
+        self.items = []
+        self.futures = []
+        self.enqueued_at = []
+        self.timer = None
+
+
+class MicroBatcher:
+    """
+    微批调度器：把短时间内到达的请求攒成一批，一次调用 handler，再把结果分发回各个调用方。
+    不论请求来自同一个会话的多句话还是不同的会话，只要参数相同就能合并。
+
+    - 一批的第一个请求到达后最多等待 max_wait_ms 毫秒，攒够 max_items 个时立即发出
+    - 参数（kwargs）不同的请求不会合并到同一批
+    - 还没发出就被取消的请求从批里去掉，不浪费推理
+    - handler 出错或返回的条数对不上时，这一批的每个请求都得到 None（与组件合成失败时一致）
+
+    参数:
+        handler: async handler(items: list, **kwargs) -> list，返回与 items 一一对应的结果
+        name (str): 用于日志和统计
+        max_wait_ms (float): 攒批的最长等待时间（毫秒）
+        max_items (int): 一批最多多少个请求
+    """
+
+    def __init__(self, handler, name: str = "", max_wait_ms: float = 10, max_items: int = 8):
+        self.handler = handler
+        self.name = name
+        self.max_wait = max_wait_ms / 1000
+        self.max_items = max(1, max_items)
+        self._batches = {}  # 参数 -> 正在攒的批
+        self._tasks = set()
+
+    async def submit(self, item, **kwargs):
+        """提交一个请求，等这一批处理完后返回它的结果"""
+        loop = asyncio.get_running_loop()
+        key = json.dumps(kwargs, ensure_ascii=False, sort_keys=True, default=str)
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(kwargs)
+            batch.timer = loop.call_later(self.max_wait, self._flush, key)
+        future = loop.create_future()
+        batch.items.append(item)
+        batch.futures.append(future)
+        batch.enqueued_at.append(time.perf_counter())
+        if len(batch.items) >= self.max_items:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: str):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _Batch):
+        now = time.perf_counter()
+        live = [i for i, future in enumerate(batch.futures) if not future.done()]
+        if not live:
+            return
+        for i in live:
+            metrics.observe("batch_wait", now - batch.enqueued_at[i], provider=self.name)
+        items = [batch.items[i] for i in live]
+        try:
+            results = await self.handler(items, **batch.kwargs)
+            if len(results) != len(items):
+                raise ValueError(f"批量结果数量不对：提交 {len(items)} 个，返回 {len(results)} 个")
+        except Exception as e:
+            logging.error(f"{self.name} 批量处理失败: {e!r}")
+            results = [None] * len(items)
+        logging.debug(f"{self.name} 批量处理 {len(items)} 个请求，耗时 {time.perf_counter() - now:.3f}s")
+        for i, result in zip(live, results):
+            if not batch.futures[i].done():
+                batch.futures[i].set_result(result)
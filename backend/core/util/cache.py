@@ -0,0 +1,194 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from core.util.storage import get_database
+
+
+class LRUCache:
+    """
+    线程安全的内存 LRU 缓存，可以按条数或按字节数限制容量。
+
+    参数:
+        max_items (int): 最多缓存多少条，0 表示不限制
+        max_bytes (int): 所有值的总大小上限，0 表示不限制
+        sizeof: 计算单个值大小的函数，默认用 len
+        on_evict: 条目被淘汰时的回调 on_evict(key, value)，可用来把冷数据落盘
+    """
+
+    def __init__(self, max_items: int = 0, max_bytes: int = 0, sizeof=len, on_evict=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """命中返回值并移到最近使用的位置，未命中返回 None"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if self.max_bytes and size > self.max_bytes:
+            return  # 单条就超过上限的不缓存
+        evicted = []
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= self.sizeof(old)
+            self._data[key] = value
+            self.current_bytes += size
+            while self._data and (
+                    (self.max_items and len(self._data) > self.max_items) or
+                    (self.max_bytes and self.current_bytes > self.max_bytes)):
+                old_key, old_value = self._data.popitem(last=False)
+                self.current_bytes -= self.sizeof(old_value)
+                evicted.append((old_key, old_value))
+        # 回调可能做磁盘 IO，放到锁外面
+        if self.on_evict:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "items": len(self._data),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class DiskCache:
+    """
+    简单的磁盘字节缓存，每个 key 一个文件，超过容量时按最近访问时间删除最旧的文件。
+    key 需要是能直接当文件名用的字符串（比如哈希值）。
+
+    参数:
+        cache_dir (str): 缓存目录，不存在会自动创建
+        max_bytes (int): 目录总大小上限，0 表示不限制
+        suffix (str): 缓存文件后缀
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 0, suffix: str = ".bin"):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.current_bytes = sum(f.stat().st_size for f in self.cache_dir.glob(f"*{suffix}"))
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            os.utime(path)  # 更新访问时间，淘汰时按这个排序
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, value: bytes):
+        path = self._path(key)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(value)
+        with self._lock:
+            if path.exists():
+                self.current_bytes -= path.stat().st_size
+            os.replace(tmp_path, path)  # 原子替换，避免其他线程读到写了一半的文件
+            self.current_bytes += len(value)
+            if self.max_bytes and self.current_bytes > self.max_bytes:
+                self._prune()
+
+    def _prune(self):
+        """删除最久未访问的文件，直到总大小降到上限的九成以下"""
+        files = sorted(self.cache_dir.glob(f"*{self.suffix}"), key=lambda f: f.stat().st_mtime)
+        target = self.max_bytes * 0.9
+        for f in files:
+            if self.current_bytes <= target:
+                break
+            try:
+                size = f.stat().st_size
+                f.unlink()
+                self.current_bytes -= size
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SQLiteCache:
+    """
+    基于 SQLite 的持久化字符串缓存，适合翻译结果这类体积小、希望重启后还在的数据。
+    底层使用 core.util.storage 的共享连接（每个线程一个，WAL 模式），可以在任意线程里调用。
+
+    参数:
+        db_name (str): 数据库文件路径
+        table (str): 表名
+    """
+
+    def __init__(self, db_name: str, table: str = "cache"):
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.db = get_database(db_name)
+        self.db.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self._select_sql = f"SELECT value FROM {table} WHERE key = ?"
+        self._insert_sql = f"INSERT OR REPLACE INTO {table} (key, value) VALUES (?, ?)"
+
+    def get(self, key: str):
+        row = self.db.fetchone(self._select_sql, (key,))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, value: str):
+        self.db.execute(self._insert_sql, (key, value))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import importlib
+import inspect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from core.util.metrics import metrics
+
+# 进程池的 worker 里各自构建的组件实例：(package, select) -> Client
+_worker_components = {}
+
+
+def _call_component(spec: tuple, method: str, args: tuple, kwargs: dict):
+    """
+    在进程池的 worker 里调用组件的方法。
+    组件实例在每个 worker 里按配置构建一次后复用（模型只在第一次调用时加载）
+    """
+    package, select, config = spec
+    client = _worker_components.get((package, select))
+    if client is None:
+        module = importlib.import_module(f".{select}", package=package)
+        client = _worker_components[(package, select)] = module.Client(**config)
+    return getattr(client, method)(*args, **kwargs)
+
+
+class ComponentExecutor:
+    """
+    单个组件专用的有界执行器，代替默认线程池，不同组件之间不再互相抢线程。
+
+    - kind="thread"：线程池，适合网络请求和会释放 GIL 的推理
+    - kind="process"：进程池，适合纯 Python 的 CPU 密集型组件。每个 worker 按配置各自构建一份组件
+      （见 _call_component），所以只有 run_method 能用进程池，run / call 传入的函数仍在线程里执行
+    - 准入控制：同时在执行和排队的任务最多 max_workers + queue_depth 个，超出的调用方在 slot() 里等待，
+      full 为 True 表示已经积压，流水线据此合并或丢弃句子（见 core/chat.py）；
+      wait_ready 可以带超时地等到有空余名额，超时的调用方自己决定放弃
+    - async 函数不占用线程，但同样要先拿到名额，这样 async 组件也有并发上限
+
+    参数:
+        name (str): 组件名，用于日志和统计
+        kind (str): "thread" 或 "process"
+        max_workers (int): 线程数或进程数
+        queue_depth (int): 除正在执行的之外最多允许多少个任务排队
+        component (tuple): (package, select, config)，进程池在 worker 里构建组件用
+    """
+
+    def __init__(self,
+                 name: str = "",
+                 kind: str = "thread",
+                 max_workers: int = 4,
+                 queue_depth: int = 8,
+                 component: tuple | None = None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"不支持的执行器类型: {kind}")
+        if kind == "process" and component is None:
+            raise ValueError("进程池执行器需要提供组件配置")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.capacity = self.max_workers + max(0, queue_depth)
+        self.component = component
+        self.backlog = 0  # 已经拿到名额（正在执行或排队）的任务数
+        self.waiting = 0  # 还在等名额的调用数
+        self._slots = asyncio.Semaphore(self.capacity)
+        self._released = asyncio.Event()  # 每归还一个名额就 set 一次并换成新的，见 wait_ready
+        # 线程池一直都有：同步的流式生成器逐步推进、进程池模式下的其他同步调用都在这里执行
+        self._threads = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=f"{name or 'component'}-worker")
+        self._processes = ProcessPoolExecutor(max_workers=self.max_workers) if kind == "process" else None
+        logging.info(f"组件 {name} 使用{'进程' if self._processes else '线程'}池，"
+                     f"{self.max_workers} 个 worker，最多排队 {queue_depth} 个任务")
+
+    @property
+    def full(self) -> bool:
+        """名额已经用完，新任务需要等待"""
+        return self.backlog + self.waiting >= self.capacity
+
+    @asynccontextmanager
+    async def slot(self):
+        """拿到一个名额后才能执行，名额用完时在这里等待（背压）"""
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        metrics.observe("executor_wait", time.perf_counter() - start, provider=self.name)
+        self.backlog += 1
+        try:
+            yield
+        finally:
+            self.backlog -= 1
+            self._slots.release()
+            self._released.set()
+            self._released = asyncio.Event()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """
+        等到有空余名额（full 为 False）为止，不占用名额，超过 timeout 秒返回 False。
+        只是准入检查：返回 True 之后名额仍可能先被别的调用方拿走
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.full:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._released.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    async def call(self, func, *args, **kwargs):
+        """在线程池里执行同步函数，不占用名额（调用方已经在 slot() 里时使用）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads, functools.partial(func, *args, **kwargs))
+
+    async def run(self, func, *args, **kwargs):
+        """拿到名额后执行：async 函数直接 await，同步函数放到线程池"""
+        async with self.slot():
+            if inspect.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            return await self.call(func, *args, **kwargs)
+
+    async def run_method(self, client, method: str, *args, **kwargs):
+        """
+        拿到名额后调用组件的方法。进程池模式下同步方法在 worker 进程里的那份组件上执行，
+        async 方法和线程池模式与 run 相同
+        """
+        func = getattr(client, method)
+        if self._processes is None or inspect.iscoroutinefunction(func):
+            return await self.run(func, *args, **kwargs)
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._processes, _call_component, self.component, method, args, kwargs)
+
+    def shutdown(self):
+        """应用退出时关闭线程池和进程池，不等待还没开始的任务"""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes:
+            self._processes.shutdown(wait=False, cancel_futures=True)
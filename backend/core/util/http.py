@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+import aiohttp
+
+# 这些状态码通常是服务端暂时不可用，值得重试
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HttpClient:
+    """
+    带连接池和重试的异步 HTTP 客户端，给调用 HTTP 接口的组件（GPT-SoVITS、百度翻译等）共用。
+
+    - 长连接：同一个事件循环里复用一个 aiohttp 会话，连接保持 keepalive_timeout 秒，不用每次重新握手
+    - 连接数限制：总连接数和每个 host 的连接数都有上限，并发量不再受默认线程池大小的限制
+    - 重试：连接失败、超时和 RETRY_STATUSES 中的状态码按指数退避（带随机抖动）重试
+    - 超时：建立连接和两次读取之间的超时分别配置
+
+    参数:
+        max_connections (int): 连接池总连接数
+        max_connections_per_host (int): 每个 host 的连接数，0 表示与 max_connections 相同
+        keepalive_timeout (float): 空闲连接保持时间（秒）
+        connect_timeout (float): 建立连接超时（秒）
+        read_timeout (float): 两次读取之间的超时（秒）
+        total_timeout (float): 单次请求总超时（秒），0 表示不限制（流式接口不要设置）
+        retries (int): 失败后最多重试几次
+        backoff (float): 第一次重试前的等待时间（秒），之后每次翻倍
+        backoff_max (float): 单次等待时间上限（秒）
+    """
+
+    def __init__(self,
+                 max_connections: int = 10,
+                 max_connections_per_host: int = 0,
+                 keepalive_timeout: float = 60,
+                 connect_timeout: float = 5,
+                 read_timeout: float = 30,
+                 total_timeout: float = 0,
+                 retries: int = 2,
+                 backoff: float = 0.2,
+                 backoff_max: float = 2.0):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host or max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(
+            total=total_timeout or None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._session = None
+        self._session_loop = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """获取当前事件循环的长连接会话，第一次调用或换了事件循环时创建"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间：指数退避 + 随机抖动，避免大量请求同时重试"""
+        return min(self.backoff_max, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    async def request(self, method: str, url: str, **kwargs) -> tuple[int, bytes]:
+        """
+        发送请求并读取完整响应体，失败按配置重试
+
+        返回:
+            tuple: (状态码, 响应体)。重试用完后返回最后一次的结果，连接错误则抛出最后一次的异常
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.session().request(method, url, **kwargs) as response:
+                    body = await response.read()
+                    if response.status not in RETRY_STATUSES or attempt == self.retries:
+                        return response.status, body
+                    logging.warning(f"HTTP {method} {url} 返回 {response.status}，准备重试")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"HTTP {method} {url} 失败: {e!r}，准备重试")
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """
+        发送请求，返回还没读取响应体的 response，供调用方流式读取。
+        只有在拿到响应之前（连接失败、超时、可重试的状态码）才会重试，开始读取之后不再重试
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.session().request(method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning(f"HTTP {method} {url} 失败: {e!r}，准备重试")
+            else:
+                if response.status not in RETRY_STATUSES or attempt == self.retries:
+                    break
+                logging.warning(f"HTTP {method} {url} 返回 {response.status}，准备重试")
+                response.release()
+            await asyncio.sleep(self.backoff_delay(attempt))
+
+        try:
+            yield response
+        finally:
+            response.release()
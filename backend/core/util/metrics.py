@@ -0,0 +1,180 @@
+import bisect
+import threading
+from collections import deque
+
+# 直方图的桶上限（秒），覆盖从几毫秒的发送到几十秒的整轮对话
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageStats:
+    """
+    单个阶段（按组件区分）的耗时统计（秒）：
+    - 累计直方图：次数、总耗时、各桶计数，导出给 Prometheus，由服务端计算任意时间段的分位数
+    - 最近 window 个样本：直接计算 p50/p95/p99，反映当前的延迟情况
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS, window: int = 1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # 最后一个是 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.recent.append(seconds)
+
+    def quantiles(self) -> dict:
+        """最近样本的分位数（nearest-rank）"""
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, max(0, int(q * len(samples) + 0.5) - 1))] for q in QUANTILES}
+
+    def snapshot(self) -> dict:
+        quantiles = self.quantiles()
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": quantiles[0.5],
+            "p95": quantiles[0.95],
+            "p99": quantiles[0.99],
+        }
+
+
+class Metrics:
+    """
+    进程级的阶段耗时统计，各处直接调用 metrics.observe("阶段名", 秒数, provider="组件名") 即可。
+    同一阶段不同组件（比如 baidu_api 和 argos_api 的翻译耗时）分开统计。
+    只需要计数的事件（比如 TTS 积压时跳过的句子）用 metrics.inc("事件名", provider="组件名")。
+    各个缓存的命中统计通过 register_cache 注册，导出时再读取。
+    可能在线程池里被调用，所以加了锁。
+    """
+
+    def __init__(self):
+        self._stages = {}  # (阶段名, 组件名) -> StageStats
+        self._counters = {}  # (事件名, 组件名) -> 次数
+        self._caches = {}  # 缓存名 -> 返回各层命中统计的函数
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, provider: str = ""):
+        with self._lock:
+            stats = self._stages.get((stage, provider))
+            if stats is None:
+                stats = self._stages[(stage, provider)] = StageStats()
+            stats.observe(seconds)
+
+    def inc(self, name: str, value: int = 1, provider: str = ""):
+        """事件计数加 value"""
+        with self._lock:
+            self._counters[(name, provider)] = self._counters.get((name, provider), 0) + value
+
+    def counter_snapshot(self) -> dict:
+        """事件名（有组件时为 事件名/组件名） -> 次数"""
+        with self._lock:
+            return {
+                f"{name}/{provider}" if provider else name: value
+                for (name, provider), value in sorted(self._counters.items())
+            }
+
+    def register_cache(self, name: str, stats):
+        """
+        注册一个缓存的命中统计：stats() -> {层名: {"hits": ..., "misses": ..., 可选 "items"、"bytes"}}，
+        比如 TTS.cache_stats。同名的重复注册会覆盖之前的
+        """
+        with self._lock:
+            self._caches[name] = stats
+
+    def cache_snapshot(self) -> dict:
+        """缓存名/层名 -> 命中统计"""
+        with self._lock:
+            caches = list(self._caches.items())
+        # 各缓存的 stats() 有自己的锁，放到 metrics 的锁外面调用
+        return {
+            f"{name}/{tier}": tier_stats
+            for name, stats in sorted(caches)
+            for tier, tier_stats in stats().items()
+        }
+
+    def snapshot(self) -> dict:
+        """阶段名（有组件时为 阶段名/组件名） -> 统计"""
+        with self._lock:
+            return {
+                f"{stage}/{provider}" if provider else stage: stats.snapshot()
+                for (stage, provider), stats in sorted(self._stages.items())
+            }
+
+    def render_prometheus(self, prefix: str = "maho") -> str:
+        """导出为 Prometheus 文本格式：累计直方图 + 最近样本的分位数（summary）+ 事件计数 + 缓存命中统计"""
+        histogram = f"{prefix}_stage_seconds"
+        summary = f"{prefix}_stage_recent_seconds"
+        hist_lines = [
+            f"# HELP {histogram} 语音流水线各阶段耗时",
+            f"# TYPE {histogram} histogram",
+        ]
+        summary_lines = [
+            f"# HELP {summary} 语音流水线各阶段最近样本的耗时分位数",
+            f"# TYPE {summary} summary",
+        ]
+        counter = f"{prefix}_events_total"
+        counter_lines = [
+            f"# HELP {counter} 语音流水线中的事件次数",
+            f"# TYPE {counter} counter",
+        ]
+        with self._lock:
+            for (name, provider), value in sorted(self._counters.items()):
+                counter_lines.append(f'{counter}{{event="{_escape(name)}",provider="{_escape(provider)}"}} {value}')
+            for (stage, provider), stats in sorted(self._stages.items()):
+                labels = f'stage="{_escape(stage)}",provider="{_escape(provider)}"'
+                cumulative = 0
+                for bound, count in zip(self._bucket_labels(stats), stats.bucket_counts):
+                    cumulative += count
+                    hist_lines.append(f'{histogram}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                hist_lines.append(f"{histogram}_sum{{{labels}}} {stats.total}")
+                hist_lines.append(f"{histogram}_count{{{labels}}} {stats.count}")
+
+                for q, value in stats.quantiles().items():
+                    summary_lines.append(f'{summary}{{{labels},quantile="{q}"}} {value}')
+                summary_lines.append(f"{summary}_sum{{{labels}}} {sum(stats.recent)}")
+                summary_lines.append(f"{summary}_count{{{labels}}} {len(stats.recent)}")
+        return "\n".join(hist_lines + summary_lines + counter_lines + self._render_caches(prefix)) + "\n"
+
+    def _render_caches(self, prefix: str) -> list:
+        """缓存命中、未命中次数是 counter，条数和大小是 gauge"""
+        series = (
+            ("hits", f"{prefix}_cache_hits_total", "counter", "缓存命中次数"),
+            ("misses", f"{prefix}_cache_misses_total", "counter", "缓存未命中次数"),
+            ("items", f"{prefix}_cache_items", "gauge", "缓存条数"),
+            ("bytes", f"{prefix}_cache_bytes", "gauge", "缓存占用的字节数"),
+        )
+        snapshot = self.cache_snapshot()
+        lines = []
+        for key, name, kind, help_text in series:
+            values = [(cache, stats[key]) for cache, stats in snapshot.items() if key in stats]
+            if not values:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for cache, value in values:
+                cache_name, tier = cache.split("/", 1)
+                lines.append(f'{name}{{cache="{_escape(cache_name)}",tier="{_escape(tier)}"}} {value}')
+        return lines
+
+    @staticmethod
+    def _bucket_labels(stats: StageStats) -> list:
+        return [str(bound) for bound in stats.buckets] + ["+Inf"]
+
+
+def _escape(value: str) -> str:
+    """转义 Prometheus 标签值"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
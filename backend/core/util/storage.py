@@ -1,4 +1,8 @@
+import asyncio
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 
 def get_database_connection(db_name: str = "database.db") -> sqlite3.Connection:
@@ -13,4 +17,151 @@ def get_database_connection(db_name: str = "database.db") -> sqlite3.Connection:
     """
     db_path = Path(db_name)
     connection = sqlite3.connect(db_path)
-    return connection
\ No newline at end of file
+    return connection
+
+
+class Database:
+    """
+    SQLite 数据库访问层，同一个数据库文件在进程内共用一个实例（见 get_database）。
+
+    - 每个线程缓存一个连接：sqlite3 的连接不能跨线程使用，按线程复用就不用每次打开/关闭
+    - 开启 WAL 日志：读写互不阻塞，多个线程/进程可以同时读
+    - 预编译语句：sqlite3 会按 SQL 文本缓存 prepared statement（cached_statements），
+      所以调用方统一使用 ? 占位的固定 SQL，重复执行时直接复用
+    - 连接处于自动提交模式，需要多条语句原子执行时用 transaction()
+
+    参数:
+        db_name (str): 数据库文件路径，目录不存在会自动创建
+        cached_statements (int): 每个连接缓存的预编译语句数量
+        busy_timeout (int): 数据库被锁时的等待时间（毫秒）
+    """
+
+    def __init__(self, db_name: str, cached_statements: int = 128, busy_timeout: int = 5000):
+        self.db_name = db_name
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        Path(db_name).parent.mkdir(parents=True, exist_ok=True)
+
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接，第一次调用时创建"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_name,
+                isolation_level=None,  # 自动提交，事务由 transaction() 显式控制
+                cached_statements=self.cached_statements,
+                check_same_thread=False,  # 只在创建它的线程里使用，关闭时可能在别的线程
+            )
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """执行一条语句，返回游标（可读取 lastrowid / rowcount）"""
+        return self.connection().execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params) -> sqlite3.Cursor:
+        return self.connection().executemany(sql, seq_of_params)
+
+    def fetchone(self, sql: str, params: tuple = ()):
+        return self.connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list:
+        return self.connection().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """在当前线程的连接上开启事务，正常结束提交，出错回滚"""
+        conn = self.connection()
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def close(self):
+        """关闭所有线程创建的连接"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class AsyncDatabase:
+    """
+    Database 的异步外观：查询放到专用的数据库线程池中执行，不阻塞事件循环。
+    线程池里的每个线程各自持有一个连接，相当于一个大小为 max_workers 的连接池。
+
+    参数:
+        database (Database): 底层的数据库实例
+        max_workers (int): 数据库线程数
+    """
+
+    def __init__(self, database: Database, max_workers: int = 4):
+        self.database = database
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sqlite")
+
+    async def run(self, func, *args):
+        """在数据库线程池里执行任意函数，适合把多步操作放在一起执行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return await self.run(self.database.execute, sql, params)
+
+    async def executemany(self, sql: str, seq_of_params) -> sqlite3.Cursor:
+        return await self.run(self.database.executemany, sql, seq_of_params)
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        return await self.run(self.database.fetchone, sql, params)
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> list:
+        return await self.run(self.database.fetchall, sql, params)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.database.close()
+
+
+_databases = {}
+_async_databases = {}
+_databases_lock = threading.RLock()
+
+
+def get_database(db_name: str) -> Database:
+    """
+    获取进程内共用的 Database 实例，同一个数据库文件只会创建一个
+
+    参数:
+        db_name (str): 数据库文件路径
+
+    返回:
+        Database: 数据库实例
+    """
+    key = str(Path(db_name).resolve())
+    with _databases_lock:
+        database = _databases.get(key)
+        if database is None:
+            database = _databases[key] = Database(db_name)
+        return database
+
+
+def get_async_database(db_name: str) -> AsyncDatabase:
+    """获取进程内共用的 AsyncDatabase 实例，底层与 get_database 共用同一个 Database"""
+    key = str(Path(db_name).resolve())
+    with _databases_lock:
+        database = _async_databases.get(key)
+        if database is None:
+            database = _async_databases[key] = AsyncDatabase(get_database(db_name))
+        return database
@@ -0,0 +1,50 @@
+import asyncio
+from core.util.batcher import MicroBatcher
+
+
+def run_batches(submit_all, **kwargs):
+    calls = []
+
+    async def handler(items, **params):
+        calls.append((list(items), params))
+        return [f"{item}!" for item in items]
+
+    async def main():
+        batcher = MicroBatcher(handler, name="test", **kwargs)
+        return await submit_all(batcher)
+
+    return asyncio.run(main()), calls
+
+
+def test_groups_requests_with_same_params():
+    async def submit_all(batcher):
+        return await asyncio.gather(
+            batcher.submit("a", voice="x"),
+            batcher.submit("b", voice="x"),
+            batcher.submit("c", voice="y"),
+        )
+
+    results, calls = run_batches(submit_all, max_wait_ms=20)
+    assert results == ["a!", "b!", "c!"]
+    assert sorted(calls) == [(["a", "b"], {"voice": "x"}), (["c"], {"voice": "y"})]
+
+
+def test_full_batch_flushes_immediately():
+    async def submit_all(batcher):
+        # 等待时间很长也不用等，攒够 max_items 就发出
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(4))), 1)
+
+    results, calls = run_batches(submit_all, max_wait_ms=10_000, max_items=2)
+    assert results == ["0!", "1!", "2!", "3!"]
+    assert [items for items, _ in calls] == [[0, 1], [2, 3]]
+
+
+def test_handler_error_gives_none_to_everyone():
+    async def handler(items):
+        raise RuntimeError("boom")
+
+    async def main():
+        batcher = MicroBatcher(handler, max_wait_ms=1)
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"))
+
+    assert asyncio.run(main()) == [None, None]
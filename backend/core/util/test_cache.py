@@ -0,0 +1,46 @@
+from core.util.cache import LRUCache, DiskCache, SQLiteCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_items=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"   # a 变成最近使用
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_lru_byte_limit_and_on_evict():
+    evicted = []
+    cache = LRUCache(max_bytes=10, on_evict=lambda k, v: evicted.append(k))
+    cache.put("a", b"x" * 6)
+    cache.put("b", b"x" * 6)
+    assert evicted == ["a"] and cache.current_bytes == 6
+    cache.put("c", b"x" * 11)      # 单条超过上限的不缓存
+    assert cache.get("c") is None and len(cache) == 1
+
+
+def test_disk_cache_prunes_oldest(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    for i in range(5):
+        cache.put(f"k{i}", b"x" * 30)
+    # 超过 100 字节时删到 90 以下
+    assert cache.current_bytes <= 90
+    assert cache.get("k4") == b"x" * 30
+    assert cache.get("k0") is None
+    assert not list(tmp_path.glob("*.tmp"))
+    # 重新打开时从目录里算出当前大小
+    assert DiskCache(str(tmp_path), max_bytes=100).current_bytes == cache.current_bytes
+
+
+def test_sqlite_cache_round_trip(tmp_path):
+    db_name = str(tmp_path / "cache.db")
+    cache = SQLiteCache(db_name, table="translations")
+    assert cache.get("hello") is None
+    cache.put("hello", "こんにちは")
+    cache.put("hello", "やあ")
+    assert cache.get("hello") == "やあ"
+    assert SQLiteCache(db_name, table="translations").get("hello") == "やあ"
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
@@ -0,0 +1,15 @@
+from core.util.metrics import Metrics
+
+
+def test_counter_exported_as_prometheus_counter():
+    metrics = Metrics()
+    metrics.inc("tts_shed", provider="stub")
+    metrics.inc("tts_coalesce", 3, provider="stub")
+    metrics.inc("tts_shed", provider="stub")
+    assert metrics.counter_snapshot() == {"tts_coalesce/stub": 3, "tts_shed/stub": 2}
+    assert metrics.snapshot() == {}
+
+    text = metrics.render_prometheus()
+    assert "# TYPE maho_events_total counter" in text
+    assert 'maho_events_total{event="tts_shed",provider="stub"} 2' in text
+    assert 'maho_events_total{event="tts_coalesce",provider="stub"} 3' in text
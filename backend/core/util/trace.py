@@ -0,0 +1,56 @@
+import time
+
+
+class TurnTrace:
+    """
+    一轮对话的时间线：记录各个关键点（asr_final、llm_first_token、first_sentence、first_audio、end 等）
+    的 perf_counter 时间，以及这一轮里每个句子的 SentenceTrace。
+    每个关键点只记录第一次出现的时间。
+
+    参数:
+        started_at (float): 本轮的开始时间，语音输入时是 ASR 收到最后一帧的时间，默认为现在
+    """
+
+    def __init__(self, started_at: float | None = None):
+        self.start = started_at if started_at is not None else time.perf_counter()
+        self.marks = {}
+        self.sentences = []
+
+    def mark(self, name: str, at: float | None = None) -> float | None:
+        """
+        记录一个关键点，返回距本轮开始的秒数；已经记录过的返回 None
+        """
+        if name in self.marks:
+            return None
+        self.marks[name] = at if at is not None else time.perf_counter()
+        return self.marks[name] - self.start
+
+    def timeline(self) -> str:
+        """按时间顺序列出关键点和每个句子的时间线，用于日志"""
+        lines = [", ".join(f"{name} +{at - self.start:.3f}s" for name, at in sorted(self.marks.items(), key=lambda x: x[1]))]
+        for index, sentence in enumerate(self.sentences, 1):
+            lines.append(f"  句子 {index}: {sentence.timeline(self.start)}")
+        return "\n".join(lines)
+
+
+class SentenceTrace:
+    """
+    单个句子的时间线：segmented（断句完成）、translated、tts_first_chunk、tts_done、send_start、sent
+
+    参数:
+        turn (TurnTrace): 所属的一轮对话，可以为 None
+    """
+
+    def __init__(self, turn: TurnTrace | None = None):
+        self.turn = turn
+        self.marks = {}
+        if turn is not None:
+            turn.sentences.append(self)
+
+    def mark(self, name: str, at: float | None = None) -> float:
+        """记录一个关键点，返回记录的时间"""
+        self.marks[name] = at if at is not None else time.perf_counter()
+        return self.marks[name]
+
+    def timeline(self, start: float) -> str:
+        return ", ".join(f"{name} +{at - start:.3f}s" for name, at in self.marks.items())
@@ -1,11 +1,17 @@
 from fastapi import FastAPI, WebSocket, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from core.handler.ws_handler import WSHandler
 from core.Amadeus import BaseAmadeus
 from core.auth.login import AuthManager
+from core.component.registry import ComponentRegistry
+from core.util.config import load_yaml
+from core.util.metrics import metrics
+from pathlib import Path
 import uvicorn
 import logging
+import os
 import colorlog
 
 # 日志配置，只需在主文件配置一次即可
@@ -37,8 +43,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 实例化认证管理器
-auth_manager = AuthManager()
+# 配置文件路径可以用环境变量 MAHO_CONFIG 指定（压测时用桩组件的配置，见 benchmark/pipeline.py）
+config = load_yaml(Path(os.environ.get("MAHO_CONFIG", "config.yaml")))
+
+# 启动时构建一次所有组件，之后所有 WebSocket 会话共享
+components = ComponentRegistry(config)
+
+# 实例化认证管理器。会话存储能被多个 worker 共享时，注销记录也保存在里面，定期同步，登出对所有 worker 生效
+auth_manager = AuthManager(
+    **config.get("auth", {}),
+    revocation_store=components.sessions if components.sessions.shared else None,
+)
 
 # 请求体模型
 class LoginRequest(BaseModel):
@@ -48,14 +63,32 @@ class LoginRequest(BaseModel):
 class VerifyRequest(BaseModel):
     token: str
 
-ws_handler = WSHandler()
+class HistoryRequest(BaseModel):
+    token: str
+    after: int | None = None   # 取 id 大于它的消息（增量同步）
+    before: int | None = None  # 取 id 小于它的消息（向前翻页），都不填返回最新一页
+    limit: int = 50
+
+ws_handler = WSHandler(auth_manager)
+
+@app.on_event("startup")
+async def startup():
+    """应用启动后预加载模型（比如让 Ollama 提前把模型载入显存），并开始同步其他 worker 的 token 注销记录"""
+    auth_manager.start_revocation_sync()
+    await components.preload()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """应用退出时关闭组件持有的连接池"""
+    await auth_manager.close()
+    await components.close()
 
 @app.post("/api/login")
 async def login(request: LoginRequest):
     """
     用户登录接口
     """
-    if auth_manager.verify_user(request.username, request.password):
+    if await auth_manager.verify_user_async(request.username, request.password):
         token = auth_manager.pack_token(request.username)
         logging.info(f"用户 {request.username} 登录成功")
         return {
@@ -81,10 +114,41 @@ async def verify_token(request: VerifyRequest):
     else:
         raise HTTPException(status_code=401, detail="Token 无效")
 
+@app.post("/api/logout")
+async def logout(request: VerifyRequest):
+    """
+    用户登出接口，注销当前 token
+    """
+    if await auth_manager.revoke_token_async(request.token):
+        return {"success": True}
+    raise HTTPException(status_code=401, detail="Token 无效")
+
+@app.post("/api/history")
+async def history(request: HistoryRequest):
+    """
+    分页/增量获取当前用户的对话记录
+    """
+    user_info = auth_manager.verify_token(request.token)
+    if not user_info:
+        raise HTTPException(status_code=401, detail="Token 无效")
+    if components.history is None:
+        raise HTTPException(status_code=404, detail="未启用对话记录")
+    messages, has_more = await components.history.page(
+        user_info["username"], after=request.after, before=request.before, limit=request.limit)
+    return {"messages": messages, "has_more": has_more}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Prometheus 文本格式的各阶段耗时（直方图 + 最近样本的 p50/p95/p99）、事件计数（比如 TTS 积压时跳过的句子），
+    以及翻译和 TTS 缓存的命中统计
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    # 为每个连接创建一个独立的 Amadeus 实例，确保用户隔离
-    Amadeus = BaseAmadeus()
+    # 为每个连接创建一个独立的 Amadeus 实例保存会话状态，组件则是共享的
+    Amadeus = BaseAmadeus(components)
     await ws_handler.handle_ws(websocket, Amadeus)
 
 if __name__ == "__main__":
@@ -96,4 +160,5 @@ if __name__ == "__main__":
         ws_ping_interval=300,  # 设置心跳间隔为 300 秒
         ws_ping_timeout=300    # 设置心跳超时为 300 秒
     )
+    # 多个 worker 需要在 config.yaml 里设置 session.select: sqlite，断线重连到任何一个 worker 都能接上会话：
     # uvicorn backend.main:app --host 0.0.0.0 --port 8000 --workers 4
\ No newline at end of file